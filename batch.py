@@ -0,0 +1,92 @@
+import itertools
+import json
+import multiprocessing
+import os
+
+from main import Society
+from population import VectorSociety
+from production import DEFAULT_GRAPH
+
+
+# Lancement de nombreux scénarios (taille de population, entreprises, richesse
+# initiale, nombre de tours, graine...) sur tous les cœurs. Chaque processus
+# construit et fait tourner son modèle, puis ne renvoie qu'un petit résumé :
+# les modèles eux-mêmes ne sont jamais sérialisés.
+
+DEFAULT_ENTREPRISES = (('WheetCo', "food_raw_material", 1, 1), ('FarmCo', "food_raw_material", 1, 1), ("BreadCo", "agrifood", 2, 3), ("BakeryCo", "agrifood", 2, 3))
+
+BACKENDS = {
+    "object": Society,
+    "vector": VectorSociety,
+}
+
+DEFAULT_SCENARIO = {
+    "n": 100,
+    "entreprises": DEFAULT_ENTREPRISES,
+    "wealth": 100,
+    "steps": 500,
+    "seed": 0,
+    "backend": "object",
+    "market_mode": "sequential",
+    "labour_market": False,
+    "graph": DEFAULT_GRAPH,
+}
+
+
+def scenario_grid(**axes):
+    # Produit cartésien des valeurs données, les autres paramètres gardent leur valeur par défaut
+    # ex : scenario_grid(n=[100, 1000], seed=range(10))
+    names = list(axes)
+    for values in itertools.product(*(axes[name] for name in names)):
+        scenario = dict(DEFAULT_SCENARIO)
+        scenario.update(zip(names, values))
+        yield scenario
+
+
+def build_society(scenario):
+    society_class = BACKENDS[scenario["backend"]]
+    return society_class(
+        scenario["n"],
+        scenario["entreprises"],
+        market_mode=scenario["market_mode"],
+        labour_market=scenario["labour_market"],
+        wealth=scenario["wealth"],
+        seed=scenario["seed"],
+        graph=scenario["graph"],
+    )
+
+
+def run_scenario(scenario):
+    scenario = {**DEFAULT_SCENARIO, **scenario}
+    society = build_society(scenario)
+    for _ in range(scenario["steps"]):
+        society.step()
+
+    return summarize(scenario, society)
+
+
+def summarize(scenario, society):
+    # Résumé compact (types simples uniquement) renvoyé au processus parent
+    return {
+        "scenario": {**scenario, "entreprises": [list(e) for e in scenario["entreprises"]], "graph": scenario["graph"].to_dict()},
+        "mean_wealth": society.mean_wealth(),
+        "mean_hunger": society.mean_hunger(),
+        "employment_rate": society.employment_rate(),
+        "gini": society.gini(),
+        "median_wealth": society.wealth_percentile(50),
+        "prices": {e.name: e.product_price for e in society.get_entreprises()},
+        "money": {e.name: e.money for e in society.get_entreprises()},
+    }
+
+
+def run_batch(scenarios, processes=None):
+    # Les résumés arrivent au fil de l'eau, dans l'ordre où les scénarios se terminent
+    processes = processes or os.cpu_count()
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap_unordered(run_scenario, scenarios, chunksize=1)
+
+
+if __name__ == "__main__":
+    scenarios = scenario_grid(n=[100, 200], wealth=[50, 100], seed=range(4), steps=[200])
+    for summary in run_batch(scenarios):
+        print(json.dumps(summary))
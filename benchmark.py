@@ -0,0 +1,191 @@
+import argparse
+import gc
+import json
+import multiprocessing
+import resource
+import sys
+import time
+import tracemalloc
+
+from batch import DEFAULT_ENTREPRISES
+from main import Society
+from population import VectorSociety
+from profiling import Profiler
+
+
+# Mesures de performance du modèle. Lancer : python benchmark.py [memory|scaling|profile]
+
+BACKENDS = {
+    "object": Society,
+    "vector": VectorSociety,
+}
+
+# Balayage : (moteur, individus, entreprises). Le premier cas est le scénario de main.py.
+# Au-delà de 100 000 individus, seul le moteur vectoriel reste raisonnable.
+SCALING_CASES = (
+    [("object", n, 4) for n in (100, 1_000, 10_000, 100_000)]
+    + [("vector", n, 4) for n in (100, 1_000, 10_000, 100_000, 1_000_000)]
+    + [(backend, 10_000, firms) for backend in BACKENDS for firms in (100, 1_000, 10_000)]
+)
+
+# Tolérances par défaut face à la référence : tours/s au moins 20 % plus lents, ou RSS 20 % plus haute
+SPEED_TOLERANCE = 0.2
+MEMORY_TOLERANCE = 0.2
+
+
+def traced_size(build):
+    # Mémoire allouée (et encore vivante) par la construction d'un modèle
+    gc.collect()
+    tracemalloc.start()
+    society = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del society
+    return size
+
+
+def run_steps(society, steps):
+    for _ in range(steps):
+        society.step()
+    return society
+
+
+def bytes_per_individual(backend="object", n=20000, steps=3):
+    # Différence entre deux tailles de population : le coût fixe du modèle s'annule
+    society_class = BACKENDS[backend]
+    small = traced_size(lambda: run_steps(society_class(n // 10, DEFAULT_ENTREPRISES, seed=0), steps))
+    large = traced_size(lambda: run_steps(society_class(n, DEFAULT_ENTREPRISES, seed=0), steps))
+    return (large - small) / (n - n // 10)
+
+
+def metrics_bytes(society):
+    return sum(buffer.nbytes for buffer in society.metrics.firms.values())
+
+
+def bytes_per_entreprise(backend="object", n=2000):
+    # Entreprises ajoutées à un modèle existant. Chacune y prend une colonne dans les tampons
+    # de métriques (512 tours x 5 séries au départ) : cette part est retirée, comme pour les individus
+    society = BACKENDS[backend](0, (), seed=0)
+    before = metrics_bytes(society)
+    create = lambda: [society.entreprise_class(society, f"Firm{i}", "food_raw_material" if i % 2 else "agrifood", 1, 1) for i in range(n)]
+    size = traced_size(create)
+    return (size - (metrics_bytes(society) - before)) / n
+
+
+def memory_report():
+    for backend in BACKENDS:
+        print(f"{backend:>6} | Individu : {bytes_per_individual(backend):8.1f} octets | Entreprise : {bytes_per_entreprise(backend):8.1f} octets")
+
+
+def make_entreprises(count):
+    # Les 4 entreprises de main.py, ou autant de producteurs de blé que de boulangeries
+    if count == len(DEFAULT_ENTREPRISES): return DEFAULT_ENTREPRISES
+    return tuple(
+        (f"WheetCo{i}", "food_raw_material", 1, 1) if i % 2 else (f"BreadCo{i}", "agrifood", 2, 3)
+        for i in range(count)
+    )
+
+
+def case_name(backend, n, firms):
+    return f"{backend}-{n}x{firms}"
+
+
+def measure(backend, n, firms, min_seconds=1.0, max_steps=500):
+    # Tourne dans un processus neuf : la RSS maximale est celle de ce seul cas
+    start = time.perf_counter()
+    society = BACKENDS[backend](n, make_entreprises(firms), seed=0)
+    build_seconds = time.perf_counter() - start
+
+    # Premier tour hors chronomètre, puis au moins 3 tours et min_seconds
+    society.step()
+    steps = 0
+    start = time.perf_counter()
+    while steps < 3 or (time.perf_counter() - start < min_seconds and steps < max_steps):
+        society.step()
+        steps += 1
+    seconds = time.perf_counter() - start
+
+    return {
+        "case": case_name(backend, n, firms),
+        "backend": backend,
+        "individuals": n,
+        "entreprises": firms,
+        "build_seconds": build_seconds,
+        "steps": steps,
+        "steps_per_sec": steps / seconds,
+        # ru_maxrss est en kilo-octets sous Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _measure_case(case):
+    return measure(*case)
+
+
+def scaling_suite(cases=SCALING_CASES):
+    # Un processus par cas (maxtasksperchild=1), les cas l'un après l'autre pour ne pas fausser les temps
+    with multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        yield from pool.imap(_measure_case, cases)
+
+
+def check_regressions(results, baseline, speed_tolerance=SPEED_TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    # Compare aux mesures de référence (même machine) ; renvoie les écarts au-delà des tolérances
+    reference = {r["case"]: r for r in baseline}
+    regressions = []
+    for result in results:
+        before = reference.get(result["case"])
+        if before is None: continue
+        if result["steps_per_sec"] < before["steps_per_sec"] * (1 - speed_tolerance):
+            regressions.append(f"{result['case']} : {result['steps_per_sec']:.2f} tours/s (référence {before['steps_per_sec']:.2f})")
+        if result["peak_rss_mb"] > before["peak_rss_mb"] * (1 + memory_tolerance):
+            regressions.append(f"{result['case']} : {result['peak_rss_mb']:.1f} Mo (référence {before['peak_rss_mb']:.1f})")
+    return regressions
+
+
+def scaling_report(cases=SCALING_CASES, baseline_path=None, save_baseline=False):
+    print(f"{'Cas':<24} | {'Tours/s':>10} | {'Construction (s)':>16} | {'RSS max (Mo)':>12}")
+    results = []
+    for result in scaling_suite(cases):
+        print(f"{result['case']:<24} | {result['steps_per_sec']:10.2f} | {result['build_seconds']:16.2f} | {result['peak_rss_mb']:12.1f}")
+        results.append(result)
+
+    if baseline_path is None: return []
+    if save_baseline:
+        with open(baseline_path, "w") as f:
+            json.dump(results, f, indent=2)
+        return []
+
+    with open(baseline_path) as f:
+        regressions = check_regressions(results, json.load(f))
+    for regression in regressions: print(f"Régression : {regression}")
+    return regressions
+
+
+def profile_report(backend="object", n=100, firms=4, steps=500, allocations=False):
+    # Répartition du temps d'un tour, par défaut sur le scénario de main.py
+    society = BACKENDS[backend](n, make_entreprises(firms), seed=0)
+    with Profiler(society, allocations=allocations) as profiler:
+        run_steps(society, steps)
+    print(profiler.format_report())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", nargs="?", default="memory", choices=("memory", "scaling", "profile"))
+    parser.add_argument("--quick", action="store_true", help="balayage réduit (jusqu'à 10 000 individus / 1 000 entreprises)")
+    parser.add_argument("--baseline", help="fichier JSON de référence pour détecter les régressions")
+    parser.add_argument("--save-baseline", action="store_true", help="enregistre les mesures comme nouvelle référence")
+    parser.add_argument("--backend", default="object", choices=tuple(BACKENDS))
+    parser.add_argument("--individuals", type=int, default=100)
+    parser.add_argument("--entreprises", type=int, default=4)
+    parser.add_argument("--allocations", action="store_true", help="mémoire allouée par phase (profile)")
+    args = parser.parse_args()
+
+    if args.command == "memory":
+        memory_report()
+    elif args.command == "profile":
+        profile_report(args.backend, args.individuals, args.entreprises, allocations=args.allocations)
+    else:
+        cases = [case for case in SCALING_CASES if case[1] <= 10_000 and case[2] <= 1_000] if args.quick else SCALING_CASES
+        if scaling_report(cases, args.baseline, args.save_baseline): sys.exit(1)
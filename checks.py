@@ -0,0 +1,196 @@
+import itertools
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from batch import DEFAULT_ENTREPRISES, run_scenario
+from main import Individual, Society
+from population import VectorSociety
+from production import ProductionGraph, Sector
+from profiling import PHASES, Profiler
+from regions import RegionalEconomy
+
+
+# Vérifications exécutables des garanties du modèle. Lancer : python checks.py [nom ...]
+# Chaque vérification lève AssertionError avec le détail de l'écart.
+
+MARKET_MODES = ("sequential", "auction")
+
+
+def trajectories(society_class, market_mode, seeds, steps, **kwargs):
+    # Moyennes sur les graines, tour par tour : richesse, faim et prix du pain
+    wealth, hunger, price = [], [], []
+    for seed in seeds:
+        society = society_class(100, DEFAULT_ENTREPRISES, market_mode=market_mode, seed=seed, **kwargs)
+        runs = ([], [], [])
+        for _ in range(steps):
+            society.step()
+            runs[0].append(society.mean_wealth())
+            runs[1].append(society.mean_hunger())
+            runs[2].append(np.mean([e.product_price for e in society.get_entreprises("agrifood")]))
+        wealth.append(runs[0])
+        hunger.append(runs[1])
+        price.append(runs[2])
+    return np.mean(wealth, axis=0), np.mean(hunger, axis=0), np.mean(price, axis=0)
+
+
+def check_backends_agree(seeds=range(8), steps=300):
+    # Le moteur vectoriel suit la même dynamique agrégée que le moteur objet (scénario par défaut)
+    checkpoints = [9, 49, 99, steps - 1]
+    for market_mode in MARKET_MODES:
+        wealth, hunger, price = trajectories(Society, market_mode, seeds, steps)
+        v_wealth, v_hunger, v_price = trajectories(VectorSociety, market_mode, seeds, steps)
+
+        assert np.allclose(v_wealth[checkpoints], wealth[checkpoints], rtol=0.05), \
+            f"{market_mode} : richesse moyenne {v_wealth[checkpoints]} contre {wealth[checkpoints]}"
+        assert np.allclose(v_hunger[checkpoints], hunger[checkpoints], atol=2), \
+            f"{market_mode} : faim moyenne {v_hunger[checkpoints]} contre {hunger[checkpoints]}"
+        assert np.isclose(v_price[:50].mean(), price[:50].mean(), rtol=0.2), \
+            f"{market_mode} : prix du pain {v_price[:50].mean():.3f} contre {price[:50].mean():.3f}"
+
+
+def check_labour_market(seeds=range(4), steps=300):
+    # Avec le marché du travail, le scénario par défaut garde des emplois et nourrit sa population
+    for society_class in (Society, VectorSociety):
+        for market_mode in MARKET_MODES:
+            for seed, job_search_rate in itertools.product(seeds, (0.0, 0.05)):
+                context = f"{society_class.__name__} {market_mode} graine {seed} mobilité {job_search_rate}"
+                society = society_class(100, DEFAULT_ENTREPRISES, market_mode=market_mode, seed=seed, labour_market=True, job_search_rate=job_search_rate)
+                employment, hunger = [], []
+                for _ in range(steps):
+                    society.step()
+                    employment.append(society.employment_rate())
+                    hunger.append(society.mean_hunger())
+                    assert max(society.labour_market.vacancies) <= society.population_size(), \
+                        f"{context} : {society.labour_market.vacancies} postes pour {society.population_size()} individus"
+
+                assert min(employment[-100:]) > 0, f"{context} : plus aucun emploi"
+                assert min(hunger[-100:]) > 50, f"{context} : faim moyenne {min(hunger[-100:]):.1f}"
+
+
+def model_state(society):
+    # Tout ce qu'une sauvegarde contient, en tableaux ordinaires (copies des colonnes projetées)
+    arrays = {**society.population_state(), **society.entreprises_state(), **society.metrics.state()}
+    return {name: np.array(values) for name, values in arrays.items()}
+
+
+def assert_same_state(a, b, context):
+    state_a, state_b = model_state(a), model_state(b)
+    assert a.steps == b.steps, f"{context} : tour {a.steps} contre {b.steps}"
+    for name, values in state_a.items():
+        assert np.array_equal(values, state_b[name], equal_nan=True), f"{context} : {name} diffère"
+
+
+def check_resume(steps=30):
+    # Une reprise depuis une sauvegarde suit exactement la trajectoire ininterrompue, y compris
+    # quand on sauvegarde par-dessus le fichier projeté ou qu'on forke deux fois au même chemin
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "society.snap")
+        for society_class in (Society, VectorSociety):
+            for market_mode in MARKET_MODES:
+                context = f"{society_class.__name__} {market_mode}"
+                society = society_class(100, DEFAULT_ENTREPRISES, market_mode=market_mode, seed=5, labour_market=True)
+                for _ in range(steps): society.step()
+
+                society.save(path)
+                resumed = society_class.load(path, mmap=True)
+                for _ in range(steps): society.step(); resumed.step()
+                assert_same_state(society, resumed, f"{context}, reprise")
+
+                # Sauvegarde dans le fichier dont les colonnes sont projetées
+                resumed.save(path)
+                for _ in range(steps): society.step(); resumed.step()
+                assert_same_state(society, resumed, f"{context}, sauvegarde sur le fichier projeté")
+
+                # Un second fork au même chemin ne touche pas le premier
+                first = society.fork(path)
+                expected = model_state(first)
+                society.step()
+                society.fork(path)
+                for name, values in model_state(first).items():
+                    assert np.array_equal(values, expected[name], equal_nan=True), f"{context}, premier fork : {name} modifié"
+
+        # Population réduite en cours de route : la reprise a le même nombre d'individus
+        society = Society(100, DEFAULT_ENTREPRISES, seed=5, labour_market=True)
+        for _ in range(steps): society.step()
+        next(iter(society.get_individuals())).remove()
+        society.save(path)
+        resumed = Society.load(path)
+        assert resumed.population_size() == society.population_size() == resumed.stats.count, \
+            f"individu retiré : {resumed.population_size()} individus repris pour {society.population_size()}"
+        for _ in range(steps): society.step(); resumed.step()
+        assert_same_state(society, resumed, "Society, reprise après retrait d'un individu")
+
+
+# Chaîne à trois biens (blé -> farine -> pain) : le nombre de biens vient du graphe du scénario
+MILL_GRAPH = ProductionGraph(
+    goods=("wheet", "flour", "bread"),
+    sectors=[
+        Sector("food_raw_material", "wheet", skill=1.0),
+        Sector("mill", "flour", {"wheet": 1}, skill=1.5),
+        Sector("agrifood", "bread", {"flour": 2}, skill=2.0),
+    ],
+    food="bread",
+)
+MILL_ENTREPRISES = (("WheetCo", "food_raw_material", 1, 1), ("MillCo", "mill", 1, 2), ("BreadCo", "agrifood", 2, 3))
+
+
+def check_single_region(steps=100):
+    # Une économie à une seule région n'échange rien : elle suit exactement le modèle seul
+    scenarios = [
+        {"seed": 3, "steps": steps},
+        {"seed": 4, "steps": steps, "backend": "vector", "market_mode": "auction", "labour_market": True},
+        {"seed": 5, "steps": steps, "entreprises": MILL_ENTREPRISES, "graph": MILL_GRAPH},
+    ]
+    for scenario in scenarios:
+        expected = run_scenario(scenario)
+        with RegionalEconomy([scenario]) as economy:
+            summary = economy.run(steps)[0]
+        for key, value in expected.items():
+            assert summary[key] == value, f"{scenario} : {key} {summary[key]} contre {value}"
+
+    # Les tables d'échange ont une colonne par bien du graphe des régions
+    with RegionalEconomy([scenarios[2], {**scenarios[2], "seed": 6}]) as economy:
+        economy.run(10)
+        assert economy.offers.shape[1] == len(MILL_GRAPH.goods), f"offres sur {economy.offers.shape[1]} biens"
+
+
+def check_profiler_nesting(steps=3):
+    # Des profileurs désactivés dans n'importe quel ordre ne laissent aucune enveloppe,
+    # et ceux encore actifs continuent de compter
+    for society_class in (Society, VectorSociety):
+        classes = (Individual, society_class.entreprise_class)
+        originals = [dict(vars(cls)) for cls in classes]
+        for order in itertools.permutations(range(3)):
+            a = society_class(50, DEFAULT_ENTREPRISES, seed=0)
+            b = society_class(50, DEFAULT_ENTREPRISES, seed=0)
+            profilers = [Profiler(a), Profiler(a), Profiler(b)]
+            for profiler in profilers: profiler.enable()
+
+            for i in order:
+                profilers[i].disable()
+                calls = [sum(values[0] for values in p.stats.values()) for p in profilers]
+                for _ in range(steps): a.step(); b.step()
+                for p, before in zip(profilers, calls):
+                    counted = sum(values[0] for values in p.stats.values()) > before
+                    assert counted == p.enabled, f"{society_class.__name__} ordre {order} : profileur {profilers.index(p)} actif={p.enabled}"
+
+            assert [dict(vars(cls)) for cls in classes] == originals, f"{society_class.__name__} ordre {order} : méthodes encore enveloppées"
+            assert not any(name in vars(model) for model in (a, b) for name in PHASES), f"{society_class.__name__} ordre {order} : phases encore enveloppées"
+
+
+CHECKS = {
+    "backends": check_backends_agree,
+    "labour": check_labour_market,
+    "resume": check_resume,
+    "regions": check_single_region,
+    "profiler": check_profiler_nesting,
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or CHECKS:
+        CHECKS[name]()
+        print(f"{name} : ok")
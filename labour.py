@@ -0,0 +1,164 @@
+import math
+
+import numpy as np
+
+
+# Marché du travail : les entreprises publient des postes selon leur demande, les
+# chômeurs sont affectés en bloc à chaque tour. Les postes ouverts sont rangés dans un
+# arbre de Fenwick, donc pourvoir un poste tiré au hasard coûte O(log F) : le coût d'un
+# tour dépend du nombre de chercheurs d'emploi, pas de population x entreprises.
+#
+# En option (job_search_rate > 0), une partie des employés change d'entreprise quand des
+# postes restent ouverts après les chômeurs : la main-d'œuvre se réalloue sans attendre des
+# licenciements. Le tirage parcourt les effectifs (O(employés)), d'où la désactivation par défaut.
+
+
+# Part de l'effectif qu'une entreprise peut licencier en un tour : une demande nulle sur
+# un tour (les ménages ont du stock) ne vide pas toute l'entreprise
+LAYOFF_RATE = 0.1
+
+
+def affordable_output(entreprise, demand):
+    # Production à faire pour servir une demande : ce que le stock ne couvre pas,
+    # limité par ce que la trésorerie peut financer
+    output = max(demand - entreprise.products[entreprise.final_good()], 0.0)
+    if entreprise.unit_cost > 0:
+        return min(output, entreprise.money / entreprise.unit_cost)
+    return output
+
+
+def target_outputs(model):
+    # Production visée par entreprise, d'après la demande du tour, le stock et la trésorerie :
+    # 1. de l'aval vers l'amont, un fournisseur vise aussi ce que ses clients veulent lui acheter
+    #    (sinon, sans employés chez les clients, personne ne demande d'intrants et rien ne redémarre) ;
+    # 2. de l'amont vers l'aval, un client est limité par les intrants qu'il peut obtenir :
+    #    son stock, plus sa part du stock et de la production prévue de ses fournisseurs
+    graph = model.graph
+    targets = {e: affordable_output(e, e.step_demanded) for e in model.get_entreprises()}
+
+    for level in reversed(graph.levels):
+        for sector in level:
+            clients = model.get_entreprises(sector)
+            coefficients = graph.coefficients[graph.sector_index[sector]]
+            for good in np.flatnonzero(coefficients > 0):
+                producers = [e for name in graph.producers_of(good) for e in model.get_entreprises(name)]
+                if not producers: continue
+                needed = sum(max(coefficients[good] * targets[e] - e.products[good], 0.0) for e in clients)
+                for p in producers:
+                    targets[p] = max(targets[p], affordable_output(p, needed / len(producers)))
+
+    for level in graph.levels:
+        for sector in level:
+            clients = model.get_entreprises(sector)
+            coefficients = graph.coefficients[graph.sector_index[sector]]
+            for good in np.flatnonzero(coefficients > 0):
+                producers = [e for name in graph.producers_of(good) for e in model.get_entreprises(name)]
+                # Intrants venus d'ailleurs (autres régions) : pas de limite connue ici
+                if not producers: continue
+                supply = sum(p.products[good] + targets[p] for p in producers)
+                needs = [max(coefficients[good] * targets[e] - e.products[good], 0.0) for e in clients]
+                total_need = sum(needs)
+                for e, need in zip(clients, needs):
+                    share = supply * need / total_need if total_need > 0 else 0.0
+                    targets[e] = min(targets[e], (e.products[good] + share) / coefficients[good])
+    return targets
+
+
+def target_headcount(entreprise, target_output, population):
+    # Travail nécessaire, converti en postes selon la compétence moyenne des employés,
+    # sans dépasser la population
+    labour_needed = target_output * entreprise.labor
+    return min(math.ceil(labour_needed / entreprise.average_salary()), population)
+
+
+class VacancyPool:
+    # Postes ouverts par entreprise (arbre de Fenwick sur les effectifs)
+    def __init__(self, counts):
+        self.size = len(counts)
+        self.total = sum(counts)
+        self.tree = [0] + list(counts)
+        # Construction en O(F)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size: self.tree[parent] += self.tree[i]
+
+    def take(self, k):
+        # Pourvoit le k-ième poste ouvert (0 <= k < total) et renvoie l'indice de son entreprise
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = position + step
+            if nxt <= self.size and self.tree[nxt] <= k:
+                position = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+
+        # position + 1 est l'entreprise (indice Fenwick), on retire le poste
+        self._update(position, -1)
+        return position
+
+    def give_back(self, j):
+        # Rouvre un poste de l'entreprise j
+        self._update(j, 1)
+
+    def _update(self, j, delta):
+        i = j + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+        self.total += delta
+
+
+class LabourMarket:
+    def __init__(self, model, job_search_rate=0.0):
+        self.model = model
+        self.job_search_rate = job_search_rate # Part des employés qui cherchent un autre poste
+        self.job_seekers = []
+        self.vacancies = []
+        self.pool = VacancyPool([])
+
+    def add_seeker(self, individual):
+        self.job_seekers.append(individual)
+
+    def open(self, entreprises, per_firm):
+        # Postes de départ, avant que les entreprises ne connaissent leur demande
+        self.vacancies = [per_firm] * len(entreprises)
+        self.pool = VacancyPool(self.vacancies)
+
+    def post_vacancies(self, entreprises):
+        # En fin de tour (avant la remise à zéro de step_demanded) : chaque entreprise
+        # ajuste son effectif à sa demande, en licenciant ou en ouvrant des postes
+        self.vacancies = []
+        targets = target_outputs(self.model)
+        for e in entreprises:
+            gap = target_headcount(e, targets[e], self.model.population_size()) - e.headcount()
+            if gap < 0:
+                self.job_seekers.extend(e.lay_off(min(-gap, math.ceil(LAYOFF_RATE * e.headcount()))))
+            self.vacancies.append(max(gap, 0))
+        self.pool = VacancyPool(self.vacancies)
+
+    def match(self):
+        # Chercheurs d'emploi pris dans un ordre aléatoire, chacun sur un poste ouvert tiré au hasard
+        if not self.job_seekers or self.pool.total == 0: return
+        entreprises = self.model.get_entreprises()
+        self.model.random.shuffle(self.job_seekers)
+
+        hired = 0
+        for individual in self.job_seekers:
+            if self.pool.total == 0: break
+            j = self.pool.take(self.model.random.randrange(self.pool.total))
+            individual.apply_to(entreprises[j])
+            hired += 1
+        del self.job_seekers[:hired]
+
+        # Postes restants : une partie des employés change d'entreprise (option)
+        if self.job_search_rate <= 0 or self.pool.total == 0: return
+        employed = [i for e in entreprises for i in e.employees]
+        movers = self.model.random.sample(employed, min(self.pool.total, round(self.job_search_rate * len(employed))))
+        for individual in movers:
+            j = self.pool.take(self.model.random.randrange(self.pool.total))
+            if entreprises[j] is individual.working_at:
+                self.pool.give_back(j) # Poste dans sa propre entreprise : il reste ouvert
+                continue
+            individual.leave_job()
+            individual.apply_to(entreprises[j])
@@ -1,6 +1,12 @@
 import mesa
-import random
 import math
+import numpy as np
+from array import array
+
+from labour import LabourMarket, VacancyPool
+from metrics import Metrics, PopulationStats, TextLog
+from production import DEFAULT_GRAPH, ProductionGraph
+from snapshot import read_snapshot, write_snapshot
 
 
 
@@ -8,24 +14,35 @@ import math
 
 
 class Entreprise(mesa.Agent):
+    # Attributs fixes : pas de dictionnaire propre par entreprise
+    __slots__ = (
+        "name", "purpose", "labor", "step_labor", "last_labor", "total_labor", "employees", "products",
+        "step_production", "step_sold", "step_demanded", "demand_at_production", "late_demand", "step_costs",
+        "unit_cost", "input_prices", "product_price", "money",
+    )
+
     def __init__(self, model: mesa.Model, name, purpose, labor, price):
-        super().__init__(model)
+        # Le secteur doit être connu avant l'enregistrement dans le modèle (index par secteur)
         self.name = name
-        self.purpose = purpose # Soit : agrifood, food_raw_material 
+        self.purpose = purpose # Secteur du graphe de production (ex : agrifood, food_raw_material)
+        super().__init__(model)
         self.labor = labor
         self.step_labor = 0
         self.last_labor = 0
         self.total_labor = 0
         self.employees: list[Individual] = []
-        self.products = {"wheet" : 0.0, "bread" : 0.0} # Stock
+        self.products = array('d', [0.0] * len(model.graph.goods)) # Stock, indexé par bien
 
         # Statistiques
         self.step_production = 0
         self.step_sold = 0
         self.step_demanded = 0
+        # Demande arrivée après la production (clients des niveaux suivants du graphe), reportée au tour suivant
+        self.demand_at_production = 0
+        self.late_demand = 0
         self.step_costs = 0 # <--- NOUVEAU : Pour calculer le coût de revient
         self.unit_cost = 0  # <--- NOUVEAU : Coût d'un produit
-        self.step_consumption_price = 0
+        self.input_prices = array('d', [0.0] * len(model.graph.goods)) # Dernier prix payé par intrant
 
         self.product_price = price
         self.money = 15000
@@ -39,26 +56,16 @@ class Entreprise(mesa.Agent):
         # Simplification : on accepte tout le monde pour l'instant
         individual.working_at = self
         self.employees.append(individual)
+        self.model.stats.employment_changed(1)
         return True
-    
-    def produce(self):
-        # On calcule combien on peut produire
-        production = 0
-        if self.purpose == "food_raw_material":
-            production = self.step_labor / self.labor
-            self.products["wheet"] += production
-        
-        elif self.purpose == "agrifood":
-            # Fonction de production Leontief (Need 3 wheet for 1 bread)
-            max_possible_by_wheet = self.products["wheet"] / 3
-            max_possible_by_labor = self.step_labor / self.labor
-            
-            production = min(max_possible_by_labor, max_possible_by_wheet)
-            
-            self.products["bread"] += production
-            self.products['wheet'] -= production * 3
 
-        self.step_production = production
+    def lay_off(self, count):
+        # Les derniers embauchés partent en premier
+        laid_off = self.employees[len(self.employees) - count:]
+        del self.employees[len(self.employees) - count:]
+        for individual in laid_off: individual.working_at = None
+        self.model.stats.employment_changed(-len(laid_off))
+        return laid_off
 
 
 
@@ -75,65 +82,86 @@ class Entreprise(mesa.Agent):
             self.step_costs += to_pay # <-- On enregistre le coût !
 
 
-    def intermediary_consumption(self):
-        if self.purpose != "agrifood": return
-            
-        # 1. Identifier le besoin
-        capacite_travail = min((self.step_labor / self.labor) * 3 * 2, self.step_demanded*3)
-        ble_necessaire = (capacite_travail ) - self.products['wheet']
+    def receive(self, good, qty, cost):
+        # Livraison d'un achat fait au marché (mode enchère)
+        self.money -= cost
+        self.step_costs += cost
+        self.products[good] += qty
+
+    def post_order(self, needs):
+        # Mode enchère : on annonce ses besoins (calculés en bloc par Society.entreprises_step),
+        # l'achat est fait à la compensation. La trésorerie est partagée entre les intrants selon leur coût estimé.
+        orders = []
+        for good in np.flatnonzero(needs > 0):
+            carnet: SellerBook = self.model.markets.get(int(good))
+            if carnet is None or not carnet.sellers: continue
+            self.input_prices[good] = carnet.best_price
+            orders.append((carnet, float(needs[good]), needs[good] * carnet.best_price))
+
+        total_cost = sum(cost for _, _, cost in orders)
+        for carnet, quantity, cost in orders:
+            carnet.post(self, quantity, self.money * (cost / total_cost if total_cost > 0 else 1 / len(orders)))
+
+    def intermediary_consumption(self, needs):
+        # 1. Besoins calculés en bloc par Society.entreprises_step
+        for good in np.flatnonzero(needs > 0):
+            self.buy_input(int(good), float(needs[good]))
+
+    def buy_input(self, good, ble_necessaire):
+        # 2. Trouver les vendeurs (carnet déjà trié par prix croissant pour ce tour)
+        carnet: SellerBook = self.model.markets.get(good)
+        if carnet is None or not carnet.sellers: return
         
-        if ble_necessaire <= 0: return
+        self.input_prices[good] = carnet.best_price
 
-        # 2. Trouver les vendeurs
-        vendeurs = self.model.agents.select(lambda a: isinstance(a, Entreprise) and a.purpose == "food_raw_material")
-        if not vendeurs: return
-        
-        # Tri par prix croissant
-        vendeurs_tries = sorted(vendeurs, key=lambda x: x.product_price)
-        
-        self.step_consumption_price = vendeurs_tries[0].product_price
+        # Les vendeurs en rupture sont sautés : on leur reporte la demande en bloc
+        i = carnet.first_available()
+        carnet.record_spillover(ble_necessaire, self.money)
+        vendeurs_tries = carnet.sellers
 
-        i = 0
         while ble_necessaire > 0.1 and self.money > 0 and i < len(vendeurs_tries):
             vendeur: Entreprise = vendeurs_tries[i]
             
             # Important : on note la demande chez le vendeur même si on achète pas tout
             vendeur.step_demanded += min(ble_necessaire, self.money/vendeur.product_price) 
 
-            if vendeur.products['wheet'] > 0:
+            if vendeur.products[good] > 0:
                 # Quantité max qu'on peut acheter
-                qty = min(ble_necessaire, vendeur.products['wheet'], self.money / vendeur.product_price)
+                qty = min(ble_necessaire, vendeur.products[good], self.money / vendeur.product_price)
                 
                 cout = qty * vendeur.product_price
                 
                 # Transaction
                 self.money -= cout
                 self.step_costs += cout # <-- On enregistre le coût matière !
-                self.products['wheet'] += qty
+                self.products[good] += qty
                 
                 vendeur.money += cout
-                vendeur.products['wheet'] -= qty
+                vendeur.products[good] -= qty
                 vendeur.step_sold += qty
 
                 
                 ble_necessaire -= qty
             i += 1
 
+    def headcount(self):
+        return len(self.employees)
+
+    def average_salary(self):
+        if len(self.employees) > 0:
+            return sum([e.current_skill for e in self.employees]) / len(self.employees)
+        return 1.0 # Valeur par défaut
+
     def update_unit_cost(self):
         # On calcule le coût marginal théorique (plus stable)
         # Salaire moyen (basé sur les compétences des employés)
-        if len(self.employees) > 0:
-            avg_salary = sum([e.current_skill for e in self.employees]) / len(self.employees)
-        else:
-            avg_salary = 1.0 # Valeur par défaut
+        avg_salary = self.average_salary()
 
         # Coût du travail pour 1 unité
         work_cost = avg_salary * self.labor
         
-        # Coût des matières premières
-        raw_material_cost = 0
-        if self.purpose == "agrifood":
-            raw_material_cost = 3 * self.step_consumption_price
+        # Coût des matières premières (coefficients techniques x derniers prix payés)
+        raw_material_cost = self.model.graph.input_cost(self.purpose, self.input_prices)
             
         current_theoretical_cost = work_cost + raw_material_cost
         
@@ -144,9 +172,11 @@ class Entreprise(mesa.Agent):
             self.unit_cost = (self.unit_cost * 0.9) + (current_theoretical_cost * 0.1)
 
 
+    def final_good(self):
+        return self.model.graph.output_of(self.purpose)
+
     def adjust_price(self):
-        final_good = "wheet" if self.purpose == "food_raw_material" else "bread"
-        current_stock = self.products[final_good]
+        current_stock = self.products[self.final_good()]
         
         # Si on n'a rien vendu, on ne peut PAS augmenter le prix, c'est illogique
         if self.step_sold == 0:
@@ -154,7 +184,7 @@ class Entreprise(mesa.Agent):
                 self.product_price *= 0.90 # On baisse si on a du stock invendu
             
 
-        if self.last_labor > self.step_labor - len(self.employees)*0.01-0.01 and self.step_demanded < 20:
+        if self.last_labor > self.step_labor - self.headcount()*0.01-0.01 and self.step_demanded < 20:
             self.product_price *= 0.90
         # Si on a vendu, on regarde la tension
         # On n'augmente que si la demande est vraiment supérieure à l'offre ET qu'on a vendu
@@ -165,86 +195,127 @@ class Entreprise(mesa.Agent):
             self.product_price *= 0.95
 
  
-        print(f"Last labor : {self.last_labor:.2f} | Step Labor : {self.step_labor:.2f}")
+        for sink in self.model.sinks: sink.adjust_price(self)
+        self.late_demand = self.step_demanded - self.demand_at_production
         self.step_sold = 0
         self.step_demanded = 0 
         self.last_labor = self.step_labor      
         self.step_labor = 0
 
     
-    def step(self):
-
+    def start_step(self):
         # Reset des compteurs de tour
         self.step_costs = 0
         
         # 1. Payer les gens (Flux monétaire sortant)
         self.income_distribution()
-        
-        # 2. Acheter matières premières (Flux monétaire sortant)
-        self.intermediary_consumption()
-        
-        # 3. Produire (Création de valeur)
-        self.produce()
+
+    # 2. Achat des intrants et 3. production : faits en bloc pour tout un niveau du graphe
+    # par Society.entreprises_step, entre start_step et close_step
+    def close_step(self):
+        self.demand_at_production = self.step_demanded
         self.update_unit_cost()
 
-        products_formated = {key: round(value, 2) for key, value in self.products.items()}
-        print(f"Id :\033[91m{self.name}\033[0m | Money : {self.money:.2f}$ | Products : {products_formated} | Price : {self.product_price:.2f} | Production {self.step_production:.2f} | Demand : {self.step_demanded:.2f}")
+        for sink in self.model.sinks: sink.entreprise_step(self)
 
 
 
 
 
 class Individual(mesa.Agent):
+    __slots__ = ("_wealth", "_hunger", "working_at", "inventory", "step_price", "current_skill")
+
     def __init__(self, model, wealth):
         super().__init__(model)
-        self.wealth = wealth
-        self.hunger = 100
+        self._wealth = wealth
+        self._hunger = 100
+        model.stats.add(self._wealth, self._hunger)
         self.working_at : Entreprise = None
-        self.skills = {
-            "food_raw_material" : 1.0,
-            "agrifood" : 2.0
-        }
-        self.inventory = {
-            "bread": 0
-        }
+        self.inventory = array('d', [0.0] * len(model.graph.goods))
         self.step_price = 0
         self.current_skill = None
     
     def demand_work(self):
-        if self.working_at is None:
-            entreprise = self.model.agents.select(lambda a: isinstance(a, Entreprise))[random.randint(0, self.model.num_entreprises-1)]
-            if entreprise.request_work(self):
-                self.current_skill = self.skills.get(self.working_at.purpose)
+        # Avec un marché du travail, les embauches sont faites en bloc en début de tour
+        if self.working_at is None and self.model.labour_market is None:
+            entreprises = self.model.get_entreprises()
+            self.apply_to(entreprises[self.model.random.randint(0, len(entreprises)-1)])
+
+    def leave_job(self):
+        self.working_at.employees.remove(self)
+        self.working_at = None
+        self.model.stats.employment_changed(-1)
+
+    def apply_to(self, entreprise):
+        if entreprise.request_work(self):
+            self.current_skill = self.model.skills.get(self.working_at.purpose)
 
     def work(self):
         if self.working_at is not None and self.hunger > 0:
             self.current_skill += 0.01
             self.working_at.add_labour(self.current_skill)
 
+    # Richesse et faim passent par le modèle pour tenir les agrégats à jour
+    @property
+    def wealth(self):
+        return self._wealth
+
+    @wealth.setter
+    def wealth(self, value):
+        self.model.stats.wealth_changed(self._wealth, value)
+        self._wealth = value
+
+    @property
+    def hunger(self):
+        return self._hunger
+
+    @hunger.setter
+    def hunger(self, value):
+        self.model.stats.hunger_changed(self._hunger, value)
+        self._hunger = value
+
+    def food_demand(self):
+        # 2. Calculer le besoin réel (Combien je VEUX manger + un petit stock de sécurité)
+        # On veut compenser la faim actuelle + avoir un peu d'avance (max 2 pains au total)
+        ideal_stock = 2.0
+        product_needed = int(max(0, ideal_stock - self.inventory[self.model.food]))
+
+        # 3. Calculer le budget (Combien je PEUX mettre)
+        # Stratégie : Je dépense au max 30% de ma richesse, 
+        # MAIS si j'ai très faim (hunger < 50), je peux monter jusqu'à 90%
+        budget_ratio = 0.3 if self.hunger > 50 else 0.9
+        return product_needed, self.wealth * budget_ratio
+
+    def receive(self, good, qty, cost):
+        # Livraison d'un achat fait au marché (mode enchère)
+        self.wealth -= cost
+        self.inventory[good] += qty
+
+    def post_order(self, desired_product):
+        # Mode enchère : on annonce besoin et budget, le marché alloue ensuite en une passe
+        carnet: SellerBook = self.model.markets.get(desired_product)
+        if carnet is None or not carnet.sellers: return
+        self.step_price = carnet.best_price
+
+        product_needed, accepted_price = self.food_demand()
+        if product_needed <= 0: return
+        carnet.post(self, product_needed, accepted_price)
+
     def buy(self, desired_product):
-        if desired_product == "bread":
-            # 1. Récupérer et trier les boulangeries
-            boulangeries = self.model.agents.select(lambda a: isinstance(a, Entreprise) and a.purpose == "agrifood")
-            if not boulangeries: return
-            
-            # Trier par prix (Mesa utilise souvent des listes d'agents qu'on peut trier ainsi)
-            entreprises = sorted(boulangeries, key=lambda x: x.product_price)
-            self.step_price = entreprises[0].product_price
-
-            # 2. Calculer le besoin réel (Combien je VEUX manger + un petit stock de sécurité)
-            # On veut compenser la faim actuelle + avoir un peu d'avance (max 2 pains au total)
-            ideal_stock = 2.0
-            product_needed = int(max(0, ideal_stock - self.inventory['bread']))
+        if desired_product == self.model.food:
+            # 1. Récupérer les boulangeries (carnet déjà trié par prix pour ce tour)
+            carnet: SellerBook = self.model.markets.get(desired_product)
+            if carnet is None or not carnet.sellers: return
             
-            if product_needed <= 0: return
+            entreprises = carnet.sellers
+            self.step_price = carnet.best_price
 
-            # 3. Calculer le budget (Combien je PEUX mettre)
-            # Stratégie : Je dépense au max 30% de ma richesse, 
-            # MAIS si j'ai très faim (hunger < 50), je peux monter jusqu'à 90%
-            budget_ratio = 0.3 if self.hunger > 50 else 0.9
-            accepted_price = self.wealth * budget_ratio
+            product_needed, accepted_price = self.food_demand()
+            if product_needed <= 0: return
             
-            i = 0
+            # On commence au premier vendeur qui a encore du stock
+            i = carnet.first_available()
+            carnet.record_spillover(product_needed, accepted_price)
             while product_needed > 0.01 and accepted_price > 0.01 and i < len(entreprises):
                 vendeur: Entreprise = entreprises[i]
                 
@@ -255,7 +326,7 @@ class Individual(mesa.Agent):
                 max_payable = int(accepted_price / price)
                 
                 # Quantité finale pour cette transaction
-                qty_to_buy = min(product_needed, int(vendeur.products['bread']), max_payable)
+                qty_to_buy = min(product_needed, int(vendeur.products[desired_product]), max_payable)
                 
                 # Enregistrer la demande solvable (très important pour l'ajustement des prix)
                 vendeur.step_demanded += min(product_needed, max_payable)
@@ -268,8 +339,8 @@ class Individual(mesa.Agent):
                     vendeur.money += transaction_total
                     
                     # Transfert de marchandise
-                    vendeur.products['bread'] -= qty_to_buy
-                    self.inventory['bread'] += qty_to_buy
+                    vendeur.products[desired_product] -= qty_to_buy
+                    self.inventory[desired_product] += qty_to_buy
                     
                     # Mise à jour des stats vendeur
                     vendeur.step_sold += qty_to_buy
@@ -283,8 +354,9 @@ class Individual(mesa.Agent):
     def eat(self):
         to_eat = (100-self.hunger)/25
 
-        can_be_eaten = min(to_eat, self.inventory['bread'])
-        self.inventory['bread'] -= can_be_eaten
+        food = self.model.food
+        can_be_eaten = min(to_eat, self.inventory[food])
+        self.inventory[food] -= can_be_eaten
         self.hunger += can_be_eaten*25
 
     def stat(self):
@@ -295,63 +367,452 @@ class Individual(mesa.Agent):
         self.hunger -= 2
         self.demand_work()
         self.work()
-        self.buy("bread")
+        if self.model.market_mode == "auction":
+            # On mange après la compensation du marché (Society.population_step)
+            self.post_order(self.model.food)
+            return
+        self.buy(self.model.food)
         self.eat()
 
 
 
+class SellerBook:
+    # Carnet d'ordres d'un bien : les vendeurs triés par prix, construit une fois par tour.
+    # Les prix ne bougent que dans adjust_price, donc inutile de retrier à chaque achat.
+    def __init__(self, good, sellers, min_lot=0.0, min_order=0.1, min_budget=0.0):
+        self.good = good
+        self.min_lot = min_lot # Stock en dessous duquel le vendeur ne peut plus rien vendre
+        # Seuils sous lesquels un acheteur arrête ses achats (mêmes que les boucles d'achat)
+        self.min_order = min_order
+        self.min_budget = min_budget
+        self.sellers: list[Entreprise] = sorted(sellers, key=lambda x: x.product_price)
+        self.best_price = self.sellers[0].product_price if self.sellers else None
+
+        # Le curseur ne recule jamais : tout ce qui est avant est en rupture
+        self.cursor = 0
+        # Besoins et budgets des acheteurs arrivés après des ruptures
+        self.spillover_needs = array('d')
+        self.spillover_budgets = array('d')
+        # Vendeurs en rupture, avec le nombre d'acheteurs déjà passés au moment de la rupture
+        self.sold_out: list[tuple[Entreprise, int]] = []
+
+        # Ordres en attente (mode enchère)
+        self.orders: list[tuple[mesa.Agent, float, float]] = []
+
+    def is_sold_out(self, seller):
+        stock = seller.products[self.good]
+        return stock <= 0 or stock < self.min_lot
+
+    def first_available(self):
+        # Saute les vendeurs en rupture (amorti O(1) sur le tour)
+        while self.cursor < len(self.sellers) and self.is_sold_out(self.sellers[self.cursor]):
+            self.sold_out.append((self.sellers[self.cursor], len(self.spillover_needs)))
+            self.cursor += 1
+        return self.cursor
+
+    def record_spillover(self, quantity, budget):
+        # La demande adressée aux vendeurs en rupture n'est plus notée un par un :
+        # besoin et budget sont gardés ici, puis répartis dans settle()
+        if self.cursor > 0:
+            self.spillover_needs.append(quantity)
+            self.spillover_budgets.append(budget)
+
+    def settle(self):
+        # Chaque vendeur en rupture reçoit la demande solvable à son propre prix
+        # des acheteurs arrivés après sa rupture (comme dans allocate)
+        needs = np.frombuffer(self.spillover_needs)
+        budgets = np.frombuffer(self.spillover_budgets)
+        for seller, start in self.sold_out:
+            affordable = budgets[start:] / seller.product_price
+            if self.min_lot >= 1:
+                affordable = np.floor(affordable / self.min_lot) * self.min_lot
+            seller.step_demanded += float(np.minimum(needs[start:], affordable).sum())
+        self.sold_out = []
+
+    def post(self, buyer, quantity, budget):
+        self.orders.append((buyer, quantity, budget))
+
+    def clear(self):
+        # Compensation des ordres postés, puis livraison à chaque acheteur
+        if not self.orders: return
+        buyers, quantities, budgets = zip(*self.orders)
+        self.orders = []
+
+        bought, spent = self.allocate(np.array(quantities, dtype=float), np.array(budgets, dtype=float))
+        for buyer, qty, cost in zip(buyers, bought, spent):
+            if qty > 0: buyer.receive(self.good, float(qty), float(cost))
+
+    def allocate(self, quantities, budgets):
+        # Enchère : tous les ordres sont connus, l'ordre d'arrivée ne compte plus.
+        # On sert les vendeurs du moins cher au plus cher ; si un vendeur n'a pas
+        # assez, chacun reçoit une part proportionnelle à sa demande chez lui.
+        bought = np.zeros(len(quantities))
+        spent = np.zeros(len(quantities))
+        active = np.arange(len(quantities))
+
+        for seller in self.sellers:
+            active = active[(quantities[active] - bought[active] > self.min_order) & (budgets[active] - spent[active] > self.min_budget)]
+            if len(active) == 0: break
+
+            price = seller.product_price
+            affordable = (budgets[active] - spent[active]) / price
+            if self.min_lot >= 1:
+                affordable = np.floor(affordable / self.min_lot) * self.min_lot
+            wanted = np.minimum(quantities[active] - bought[active], affordable)
+
+            demand = float(wanted.sum())
+            seller.step_demanded += demand
+
+            supply = seller.products[self.good]
+            if self.min_lot >= 1:
+                supply = math.floor(supply / self.min_lot) * self.min_lot
+            if supply <= 0 or demand <= 0: continue
+
+            # Rationnement au prorata si le vendeur est court
+            filled = wanted if demand <= supply else wanted * (supply / demand)
+            sold = min(demand, supply)
+
+            bought[active] += filled
+            spent[active] += filled * price
+            seller.products[self.good] -= sold
+            seller.money += sold * price
+            seller.step_sold += sold
+
+        return bought, spent
+
+
+
 class Society(mesa.Model):
-    def __init__(self, n, entreprises):
-        super().__init__()
+    # Classe des entreprises créées par le modèle (les autres moteurs la remplacent)
+    entreprise_class = Entreprise
+
+    def __init__(self, n, entreprises, market_mode="sequential", sinks=(), metrics_every=1, wealth=100, seed=None, labour_market=False, graph=DEFAULT_GRAPH, job_search_rate=0.0):
+        # Chaque modèle a ses propres générateurs (self.random, self.rng) : deux modèles
+        # avec la même graine donnent la même trajectoire, même lancés en parallèle
+        super().__init__(seed=seed)
+        # "sequential" : les acheteurs passent un par un ; "auction" : compensation en bloc
+        if market_mode not in ("sequential", "auction"):
+            raise ValueError(f"Mode de marché inconnu : {market_mode}")
+        self.market_mode = market_mode
         self.num_individuals = n
         self.num_entreprises = len(entreprises)
 
-        for i in range(self.num_individuals):
-            Individual(self, 100)
+        # Secteurs, biens et coefficients techniques ; par défaut blé -> pain
+        self.graph = graph
+        self.food = graph.food
+        # Compétence de départ selon le secteur, partagée par tous les individus
+        self.skills = {name: sector.skill for name, sector in graph.sectors.items()}
+        for entreprise in entreprises:
+            if entreprise[1] not in graph.sectors:
+                raise ValueError(f"Secteur inconnu pour {entreprise[0]} : {entreprise[1]}")
+        # Le nom identifie l'entreprise dans les métriques et les sauvegardes
+        names = [entreprise[0] for entreprise in entreprises]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Noms d'entreprises en double : {sorted({name for name in names if names.count(name) > 1})}")
+
+        # Entreprises (dans l'ordre de création) et index par secteur, tenus à jour à l'ajout / au
+        # retrait : une liste ordinaire, sans reparcourir l'AgentSet de Mesa (références faibles)
+        self.entreprises: list[Entreprise] = []
+        self.agents_by_purpose: dict[str, list[Entreprise]] = {}
+        # Carnets d'ordres par bien, reconstruits à chaque tour
+        self.markets: dict[int, SellerBook] = {}
+        # Vendeurs des autres régions par bien (voir regions.py), ajoutés aux carnets
+        self.remote_sellers: dict[int, list] = {}
+        # Moyennes, emploi et distribution de richesse, mis à jour à chaque transaction
+        self.stats = PopulationStats()
+
+        # Affichages optionnels (ex : metrics.TextLog) ; sans sink, aucun formatage
+        self.sinks = list(sinks)
+        # Créées après les entreprises de départ ; celles ajoutées ensuite y prennent une colonne
+        self.metrics = None
+
+        self.create_population(self.num_individuals, wealth)
             
         for entreprise in entreprises:
-            Entreprise(self, entreprise[0], entreprise[1], entreprise[2], entreprise[3])
+            self.entreprise_class(self, entreprise[0], entreprise[1], entreprise[2], entreprise[3])
+
+        self.metrics = Metrics([e.name for e in self.get_entreprises()], every=metrics_every)
+
+        # Sans marché du travail, chaque chômeur postule dans une entreprise au hasard
+        self.labour_market = None
+        if labour_market:
+            self.labour_market = LabourMarket(self, job_search_rate)
+            for individual in self.get_individuals(): self.labour_market.add_seeker(individual)
+            self.labour_market.open(self.get_entreprises(), per_firm=math.ceil(n / max(len(entreprises), 1)))
+
+    def create_population(self, n, wealth):
+        for i in range(n):
+            Individual(self, wealth)
     
+    def register_agent(self, agent):
+        # Colonne de métriques d'abord : un nom déjà pris est refusé avant l'enregistrement
+        if isinstance(agent, Entreprise) and self.metrics is not None: self.metrics.add_firm(agent.name)
+        super().register_agent(agent)
+        if isinstance(agent, Entreprise):
+            self.entreprises.append(agent)
+            self.agents_by_purpose.setdefault(agent.purpose, []).append(agent)
+
+    def deregister_agent(self, agent):
+        super().deregister_agent(agent)
+        if isinstance(agent, Individual):
+            # Un individu retiré n'est plus payé ni embauché
+            if agent.working_at is not None: agent.leave_job()
+            self.stats.remove(agent.wealth, agent.hunger)
+            if self.labour_market is not None and agent in self.labour_market.job_seekers:
+                self.labour_market.job_seekers.remove(agent)
+        if isinstance(agent, Entreprise):
+            self.entreprises.remove(agent)
+            self.agents_by_purpose[agent.purpose].remove(agent)
+
+    def population_size(self):
+        return len(self.get_individuals())
+
+    def get_individuals(self) -> mesa.agent.AgentSet:
+        # AgentSet de Mesa, dans l'ordre de création (itérable, sans accès par indice rapide)
+        return self.agents_by_type.get(Individual, [])
+
+    def get_entreprises(self, purpose=None) -> list[Entreprise]:
+        # Sans secteur : toutes les entreprises, dans l'ordre de création (liste du modèle, à ne pas modifier)
+        if purpose is None:
+            return self.entreprises
+        return self.agents_by_purpose.get(purpose, [])
+
+    def producers_of(self, good) -> list[Entreprise]:
+        return [e for sector in self.graph.producers_of(good) for e in self.get_entreprises(sector)]
+
+    def sellers_of(self, good) -> list:
+        # Producteurs locaux et vendeurs distants : c'est l'offre d'un carnet
+        return self.producers_of(good) + self.remote_sellers.get(good, [])
+
     def step(self):
+        # Chaque phase est une méthode : profiling.Profiler peut les chronométrer une par une
+        # 0. Les chômeurs sont affectés aux postes ouverts au tour précédent
+        if self.labour_market is not None: self.match_workers()
+
         # 1. Les individus travaillent (on remplit step_labor des entreprises)
-        individus = self.agents.select(lambda a: isinstance(a, Individual))
-        individus.shuffle_do("step") 
+        self.markets[self.food] = SellerBook(self.food, self.sellers_of(self.food), min_lot=1, min_order=0.01, min_budget=0.01)
+        self.population_step()
+        self.markets[self.food].settle()
 
-        # 2. Les entreprises transforment le travail en produits
-        # On commence par le blé pour que les boulangeries puissent l'acheter ensuite
-        providers = self.agents.select(lambda a: isinstance(a, Entreprise) and a.purpose == "food_raw_material")
-        agrifoods = self.agents.select(lambda a: isinstance(a, Entreprise) and a.purpose == "agrifood")
-        
-        # On lance le cycle des entreprises (paie, achat matières, production)
-        for e in providers: e.step()
-        for e in agrifoods: e.step()
+        # 2. Les entreprises transforment le travail en produits, niveau par niveau du graphe :
+        # les fournisseurs d'intrants (ex : le blé) produisent avant leurs clients (ex : le pain)
+        for level in self.graph.levels:
+            self.entreprises_step([e for sector in level for e in self.get_entreprises(sector)], self.graph.level_inputs(level))
 
         # 3. Ajustement des prix pour TOUTES les entreprises (basé sur step_sold du tour précédent)
-        all_entreprises = self.agents.select(lambda a: isinstance(a, Entreprise))
-        for e in all_entreprises:
+        all_entreprises = self.get_entreprises()
+        if self.metrics.should_record(self.steps):
+            self.record_metrics()
+        # Les entreprises ajustent leurs effectifs à la demande du tour (avant sa remise à zéro)
+        if self.labour_market is not None: self.post_vacancies(all_entreprises)
+        self.adjust_prices(all_entreprises)
+
+        for sink in self.sinks: sink.society_step(self)
+
+    def match_workers(self):
+        self.labour_market.match()
+
+    def record_metrics(self):
+        self.metrics.record(self.steps, self)
+
+    def post_vacancies(self, entreprises):
+        self.labour_market.post_vacancies(entreprises)
+
+    def adjust_prices(self, entreprises):
+        for e in entreprises:
             e.adjust_price()
             e.step_demanded = 0
 
-        # Logs
-        print(f"Moyenne Argent Individus : {sum([i.wealth for i in individus])/len(individus):.2f}$")
-        print(f"Satiété moyenne : {sum([i.hunger for i in individus])/len(individus):.2f}")
+    def entreprises_step(self, entreprises, inputs):
+        # Paie, achat des intrants, puis production de tout le niveau en une passe
+        for e in entreprises: e.start_step()
+
+        # Les producteurs des intrants ont produit aux niveaux précédents : on ouvre leurs marchés
+        for good in inputs: self.markets[good] = SellerBook(good, self.sellers_of(good))
+
+        if inputs:
+            needs = self.graph.input_needs(entreprises)
+            if self.market_mode == "auction":
+                for e, row in zip(entreprises, needs): e.post_order(row)
+                for good in inputs: self.markets[good].clear()
+            else:
+                for e, row in zip(entreprises, needs): e.intermediary_consumption(row)
+            for good in inputs: self.markets[good].settle()
+
+        self.graph.produce(entreprises)
+        for e in entreprises: e.close_step()
+
+    def population_step(self):
+        self.agents_by_type[Individual].shuffle_do("step")
+        if self.market_mode == "auction":
+            self.markets[self.food].clear()
+            for individual in self.get_individuals(): individual.eat()
+
+    def mean_wealth(self):
+        return self.stats.mean_wealth()
+
+    def mean_hunger(self):
+        return self.stats.mean_hunger()
+
+    def employment_rate(self):
+        return self.stats.employment_rate()
+
+    def wealth_sketch(self):
+        # Copie en tableaux du sketch tenu à jour, convertie une fois par lecture
+        return self.stats.wealth_sketch.snapshot()
+
+    def gini(self):
+        return self.wealth_sketch().gini()
+
+    def wealth_percentile(self, q):
+        return self.wealth_sketch().percentile(q)
     
     def individual_stats(self):
-        individus = self.agents.select(lambda a: isinstance(a, Individual))
+        individus = self.get_individuals()
 
         for i in individus: i.stat()
 
+    # Sauvegarde / reprise ---------------------------------------------------------
+
+    # Champs numériques des entreprises, sauvegardés en colonnes
+    ENTREPRISE_FIELDS = (
+        "step_labor", "last_labor", "total_labor", "step_production", "step_sold", "step_demanded",
+        "demand_at_production", "late_demand", "step_costs", "unit_cost", "product_price", "money",
+    )
+
+    def save(self, path):
+        stats_header, stats_arrays = self.stats.state()
+        header = {
+            # Population et entreprises actuelles, pas celles du constructeur (des agents ont pu être ajoutés ou retirés)
+            "num_individuals": self.population_size(),
+            "entreprises": [[e.name, e.purpose, e.labor, e.product_price] for e in self.get_entreprises()],
+            "market_mode": self.market_mode,
+            "graph": self.graph.to_dict(),
+            "metrics_every": self.metrics.every,
+            "steps": self.steps,
+            # États des générateurs : la reprise continue exactement la même trajectoire
+            "random_state": self.random.getstate(),
+            "rng_state": self.rng.bit_generator.state,
+            "stats": stats_header,
+            "population": self.population_header(),
+            "labour_market": self.labour_market is not None,
+            "job_search_rate": self.labour_market.job_search_rate if self.labour_market is not None else 0.0,
+        }
+        arrays = {**self.population_state(), **self.entreprises_state(), **stats_arrays, **self.metrics.state()}
+        if self.labour_market is not None: arrays.update(self.labour_state())
+        write_snapshot(path, header, arrays)
+
+    @classmethod
+    def load(cls, path, sinks=(), mmap=False):
+        # mmap=True : les colonnes sont projetées depuis le fichier au lieu d'être lues
+        header, arrays = read_snapshot(path, mmap=mmap)
+
+        society = cls(
+            header["num_individuals"],
+            [tuple(e) for e in header["entreprises"]],
+            market_mode=header["market_mode"],
+            sinks=sinks,
+            metrics_every=header["metrics_every"],
+            labour_market=header["labour_market"],
+            graph=ProductionGraph.from_dict(header["graph"]),
+            job_search_rate=header.get("job_search_rate", 0.0),
+        )
+        society.steps = header["steps"]
+        society.restore_population(header["population"], arrays)
+        society.restore_entreprises(arrays)
+        society.stats.restore(header["stats"], arrays)
+        society.metrics.restore(arrays)
+        if society.labour_market is not None: society.restore_labour(arrays)
+
+        version, internal_state, gauss_next = header["random_state"]
+        society.random.setstate((version, tuple(internal_state), gauss_next))
+        society.rng.bit_generator.state = header["rng_state"]
+        return society
+
+    def fork(self, path):
+        # Branche "et si ?" : la copie partage les colonnes du fichier jusqu'à ce qu'elle les modifie
+        self.save(path)
+        return type(self).load(path, sinks=self.sinks, mmap=True)
+
+    def entreprises_state(self):
+        entreprises = self.get_entreprises()
+        individual_index = {individual: i for i, individual in enumerate(self.get_individuals())}
+
+        arrays = {f"entreprise.{field}": np.array([getattr(e, field) for e in entreprises], dtype=float) for field in self.ENTREPRISE_FIELDS}
+        arrays["entreprise.products"] = np.array([e.products for e in entreprises], dtype=float).reshape(len(entreprises), len(self.graph.goods))
+        arrays["entreprise.input_prices"] = np.array([e.input_prices for e in entreprises], dtype=float).reshape(len(entreprises), len(self.graph.goods))
+        # Employés de chaque entreprise, dans l'ordre d'embauche, en indices d'individus
+        arrays["entreprise.employees"] = np.array([individual_index[i] for e in entreprises for i in e.employees], dtype=np.int64)
+        arrays["entreprise.employee_offsets"] = np.cumsum([0] + [len(e.employees) for e in entreprises], dtype=np.int64)
+        return arrays
+
+    def restore_entreprises(self, arrays):
+        individus = list(self.get_individuals())
+        offsets = arrays["entreprise.employee_offsets"]
+        if len(offsets) - 1 != len(self.get_entreprises()):
+            raise ValueError(f"Sauvegarde de {len(offsets) - 1} entreprises pour {len(self.get_entreprises())} recréées")
+        for j, e in enumerate(self.get_entreprises()):
+            for field in self.ENTREPRISE_FIELDS:
+                setattr(e, field, float(arrays[f"entreprise.{field}"][j]))
+            e.products = array('d', arrays["entreprise.products"][j])
+            e.input_prices = array('d', arrays["entreprise.input_prices"][j])
+            e.employees = [individus[i] for i in arrays["entreprise.employees"][offsets[j]:offsets[j + 1]]]
+
+    def labour_state(self):
+        individual_index = {individual: i for i, individual in enumerate(self.get_individuals())}
+        return {
+            "labour.seekers": np.array([individual_index[i] for i in self.labour_market.job_seekers], dtype=np.int64),
+            "labour.vacancies": np.array(self.labour_market.vacancies, dtype=np.int64),
+        }
 
+    def restore_labour(self, arrays):
+        individus = list(self.get_individuals())
+        self.labour_market.job_seekers = [individus[i] for i in arrays["labour.seekers"]]
+        self.labour_market.vacancies = arrays["labour.vacancies"].tolist()
+        self.labour_market.pool = VacancyPool(self.labour_market.vacancies)
+
+    def population_header(self):
+        return {}
+
+    def population_state(self):
+        individus = self.get_individuals()
+        entreprise_index = {e: j for j, e in enumerate(self.get_entreprises())}
+        return {
+            "individual.wealth": np.array([i.wealth for i in individus], dtype=float),
+            "individual.hunger": np.array([i.hunger for i in individus], dtype=float),
+            "individual.current_skill": np.array([np.nan if i.current_skill is None else i.current_skill for i in individus], dtype=float),
+            "individual.step_price": np.array([i.step_price for i in individus], dtype=float),
+            "individual.employer": np.array([-1 if i.working_at is None else entreprise_index[i.working_at] for i in individus], dtype=np.int64),
+            "individual.inventory": np.array([i.inventory for i in individus], dtype=float).reshape(len(individus), len(self.graph.goods)),
+        }
 
+    def restore_population(self, header, arrays):
+        entreprises = self.get_entreprises()
+        if len(arrays["individual.wealth"]) != self.population_size():
+            raise ValueError(f"Sauvegarde de {len(arrays['individual.wealth'])} individus pour {self.population_size()} recréés")
+        columns = zip(
+            self.get_individuals(), arrays["individual.wealth"].tolist(), arrays["individual.hunger"].tolist(),
+            arrays["individual.current_skill"].tolist(), arrays["individual.step_price"].tolist(),
+            arrays["individual.employer"].tolist(), arrays["individual.inventory"],
+        )
+        for individual, wealth, hunger, skill, step_price, employer, inventory in columns:
+            # Accès direct : les agrégats sont restaurés à part
+            individual._wealth = wealth
+            individual._hunger = hunger
+            individual.current_skill = None if math.isnan(skill) else skill
+            individual.step_price = step_price
+            individual.working_at = None if employer < 0 else entreprises[employer]
+            individual.inventory = array('d', inventory)
 
 
-society_1 = Society(100, (('WheetCo', "food_raw_material", 1, 1), ('FarmCo', "food_raw_material", 1, 1), ("BreadCo", "agrifood", 2, 3), ("BakeryCo", "agrifood", 2, 3)))
 
 
 
-for i in range(500):
-    print("Step number :", i,"-------------------------")
-    society_1.step()
+if __name__ == "__main__":
+    society_1 = Society(100, (('WheetCo', "food_raw_material", 1, 1), ('FarmCo', "food_raw_material", 1, 1), ("BreadCo", "agrifood", 2, 3), ("BakeryCo", "agrifood", 2, 3)), sinks=[TextLog()])
 
+    for i in range(500):
+        print("Step number :", i,"-------------------------")
+        society_1.step()
 
-society_1.individual_stats()
+    society_1.individual_stats()
@@ -0,0 +1,261 @@
+import bisect
+import math
+
+import numpy as np
+
+
+# Séries enregistrées pour chaque entreprise (une colonne par entreprise)
+FIRM_SERIES = ("price", "stock", "production", "demand", "money")
+# Séries enregistrées pour la population
+POPULATION_SERIES = ("mean_wealth", "mean_hunger", "employment_rate", "gini", "median_wealth")
+
+
+class Metrics:
+    # Collecte des séries par tour dans des tableaux préalloués (une ligne par tour
+    # enregistré, une colonne par entreprise). Rien n'est formaté ici : l'affichage passe par les sinks.
+    def __init__(self, firm_names, every=1, capacity=512):
+        self.firm_names = list(firm_names)
+        # Colonne de chaque entreprise : les entreprises ajoutées ou retirées en cours de route gardent la leur
+        self.columns = {name: j for j, name in enumerate(self.firm_names)}
+        self.every = every # Un tour sur `every` est enregistré
+        self.count = 0
+
+        self.steps = np.zeros(capacity, dtype=np.int64)
+        self.firms = {name: np.zeros((capacity, len(self.firm_names))) for name in FIRM_SERIES}
+        self.population = {name: np.zeros(capacity) for name in POPULATION_SERIES}
+
+    def add_firm(self, name):
+        # Entreprise créée après le début : NaN pour les tours où elle n'existait pas
+        if name in self.columns:
+            raise ValueError(f"Une entreprise s'appelle déjà {name}")
+        self.columns[name] = len(self.firm_names)
+        self.firm_names.append(name)
+        width = next(iter(self.firms.values())).shape[1]
+        if len(self.firm_names) > width:
+            # Nombre de colonnes doublé (coût amorti)
+            for series, buffer in self.firms.items():
+                grown = np.full((buffer.shape[0], max(2 * width, 1)), np.nan)
+                grown[:, :width] = buffer
+                self.firms[series] = grown
+        for buffer in self.firms.values():
+            buffer[:, self.columns[name]] = np.nan
+
+    def should_record(self, step):
+        return step % self.every == 0
+
+    def _grow(self):
+        # Capacité doublée quand les tampons sont pleins (coût amorti)
+        capacity = 2 * len(self.steps)
+        self.steps = np.resize(self.steps, capacity)
+        for name, buffer in self.firms.items():
+            self.firms[name] = np.resize(buffer, (capacity, buffer.shape[1]))
+        for name, buffer in self.population.items():
+            self.population[name] = np.resize(buffer, capacity)
+
+    def record(self, step, model):
+        if self.count == len(self.steps): self._grow()
+        row = self.count
+        entreprises = model.get_entreprises()
+
+        self.steps[row] = step
+        # Les entreprises retirées restent à NaN
+        for buffer in self.firms.values(): buffer[row] = np.nan
+        for e in entreprises:
+            j = self.columns[e.name]
+            self.firms["price"][row, j] = e.product_price
+            self.firms["stock"][row, j] = e.products[e.final_good()]
+            self.firms["production"][row, j] = e.step_production
+            self.firms["demand"][row, j] = e.step_demanded
+            self.firms["money"][row, j] = e.money
+        self.population["mean_wealth"][row] = model.mean_wealth()
+        self.population["mean_hunger"][row] = model.mean_hunger()
+        self.population["employment_rate"][row] = model.employment_rate()
+        # Un seul sketch par tour enregistré (construit en bloc par le moteur vectoriel)
+        sketch = model.wealth_sketch()
+        self.population["gini"][row] = sketch.gini()
+        self.population["median_wealth"][row] = sketch.percentile(50)
+        self.count += 1
+
+    def series(self, name, firm=None):
+        # Vue sur les tours enregistrés ; `firm` : nom d'entreprise pour une seule colonne
+        if name in self.population:
+            return self.population[name][:self.count]
+        values = self.firms[name][:self.count, :len(self.firm_names)]
+        if firm is None:
+            return values
+        return values[:, self.columns[firm]]
+
+    def recorded_steps(self):
+        return self.steps[:self.count]
+
+    def state(self):
+        # Tableaux à sauvegarder (seulement les tours enregistrés)
+        arrays = {"metrics.steps": self.recorded_steps()}
+        for name in FIRM_SERIES: arrays[f"metrics.{name}"] = self.series(name)
+        for name in POPULATION_SERIES: arrays[f"metrics.{name}"] = self.population[name][:self.count]
+        return arrays
+
+    def restore(self, arrays):
+        self.count = len(arrays["metrics.steps"])
+        while len(self.steps) < self.count: self._grow()
+        self.steps[:self.count] = arrays["metrics.steps"]
+        for name in FIRM_SERIES: self.firms[name][:self.count, :len(self.firm_names)] = arrays[f"metrics.{name}"]
+        for name in POPULATION_SERIES: self.population[name][:self.count] = arrays[f"metrics.{name}"]
+
+
+class WealthSketch:
+    # Histogramme de richesse à classes logarithmiques (100 par décade, erreur relative ~2%).
+    # Chaque classe garde son effectif et sa somme : une mise à jour est O(1), Gini et
+    # percentiles se lisent en O(nombre de classes), quel que soit le nombre d'individus.
+    # Deux sketches s'additionnent (merge), par exemple entre régions.
+    # Effectifs et sommes sont des listes : chaque transaction en met à jour deux cases,
+    # c'est le chemin chaud. La conversion en tableaux se fait une fois par lecture (snapshot).
+    MIN_VALUE = 0.01
+    BINS_PER_DECADE = 100
+    DECADES = 14
+    # Bornes des classes (la classe i va de EDGES[i] à EDGES[i + 1]) : une recherche dichotomique
+    # remplace le logarithme, et le moteur vectoriel classe avec les mêmes bornes
+    EDGES = [-math.inf] + (MIN_VALUE * 10 ** (np.arange(BINS_PER_DECADE * DECADES) / BINS_PER_DECADE)).tolist() + [math.inf]
+
+    def __init__(self):
+        self.size = self.BINS_PER_DECADE * self.DECADES + 1 # Classe 0 : richesse < MIN_VALUE
+        self.counts = [0] * self.size
+        self.sums = [0.0] * self.size
+
+    def bin(self, value):
+        return bisect.bisect_right(self.EDGES, value) - 1
+
+    def add(self, value):
+        i = self.bin(value)
+        self.counts[i] += 1
+        self.sums[i] += value
+
+    def remove(self, value):
+        i = self.bin(value)
+        self.counts[i] -= 1
+        self.sums[i] -= value
+
+    def move(self, old, new):
+        i = self.bin(old)
+        # Cas courant : la richesse reste dans sa classe, une seule recherche
+        if self.EDGES[i] <= new < self.EDGES[i + 1]:
+            self.sums[i] += new - old
+        else:
+            j = self.bin(new)
+            self.counts[i] -= 1
+            self.sums[i] -= old
+            self.counts[j] += 1
+            self.sums[j] += new
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sums = [a + b for a, b in zip(self.sums, other.sums)]
+        return self
+
+    def snapshot(self):
+        # Copie figée en tableaux, lue par gini() et percentile() sans reconversion
+        sketch = WealthSketch()
+        sketch.counts = np.array(self.counts, dtype=np.int64)
+        sketch.sums = np.array(self.sums)
+        return sketch
+
+    @classmethod
+    def from_values(cls, values):
+        # Construction en bloc depuis un tableau (moteur vectoriel), mêmes classes que bin()
+        sketch = cls()
+        values = np.asarray(values, dtype=float)
+        bins = np.searchsorted(cls.EDGES, values, side="right") - 1
+        sketch.counts = np.bincount(bins, minlength=sketch.size)
+        sketch.sums = np.bincount(bins, weights=values, minlength=sketch.size)
+        return sketch
+
+    def percentile(self, q):
+        # Moyenne de la classe qui contient le q-ième percentile
+        counts = np.asarray(self.counts)
+        total = counts.sum()
+        if total == 0: return 0.0
+        i = int(np.searchsorted(np.cumsum(counts), q / 100 * total))
+        i = min(i, self.size - 1)
+        while counts[i] == 0 and i > 0: i -= 1
+        return float(self.sums[i] / counts[i]) if counts[i] else 0.0
+
+    def gini(self):
+        # Gini sur les données groupées : les individus d'une classe ont la richesse moyenne de la classe
+        counts = np.asarray(self.counts, dtype=float)
+        sums = np.asarray(self.sums)
+        n, total = counts.sum(), sums.sum()
+        if n == 0 or total <= 0: return 0.0
+        ranks_before = np.cumsum(counts) - counts
+        weighted = (sums * (ranks_before + (counts + 1) / 2)).sum()
+        return float(2 * weighted / (n * total) - (n + 1) / n)
+
+
+class PopulationStats:
+    # Agrégats de population tenus à jour par différence à chaque transaction,
+    # pour éviter de reparcourir tous les individus à chaque tour
+    def __init__(self):
+        self.count = 0
+        self.total_wealth = 0.0
+        self.total_hunger = 0.0
+        self.employed = 0
+        self.wealth_sketch = WealthSketch()
+
+    def add(self, wealth, hunger, employed=False):
+        self.count += 1
+        self.total_wealth += wealth
+        self.total_hunger += hunger
+        self.employed += employed
+        self.wealth_sketch.add(wealth)
+
+    def remove(self, wealth, hunger, employed=False):
+        self.count -= 1
+        self.total_wealth -= wealth
+        self.total_hunger -= hunger
+        self.employed -= employed
+        self.wealth_sketch.remove(wealth)
+
+    def wealth_changed(self, old, new):
+        self.total_wealth += new - old
+        self.wealth_sketch.move(old, new)
+
+    def hunger_changed(self, old, new):
+        self.total_hunger += new - old
+
+    def employment_changed(self, delta):
+        self.employed += delta
+
+    def mean_wealth(self):
+        return self.total_wealth / self.count if self.count else 0.0
+
+    def mean_hunger(self):
+        return self.total_hunger / self.count if self.count else 0.0
+
+    def employment_rate(self):
+        return self.employed / self.count if self.count else 0.0
+
+    def state(self):
+        header = {"count": self.count, "total_wealth": self.total_wealth, "total_hunger": self.total_hunger, "employed": self.employed}
+        arrays = {"stats.sketch_counts": np.array(self.wealth_sketch.counts, dtype=np.int64), "stats.sketch_sums": np.array(self.wealth_sketch.sums)}
+        return header, arrays
+
+    def restore(self, header, arrays):
+        self.count = header["count"]
+        self.total_wealth = header["total_wealth"]
+        self.total_hunger = header["total_hunger"]
+        self.employed = header["employed"]
+        self.wealth_sketch.counts = arrays["stats.sketch_counts"].tolist()
+        self.wealth_sketch.sums = arrays["stats.sketch_sums"].tolist()
+
+
+class TextLog:
+    # Sink lisible : reproduit l'affichage console d'origine
+    def entreprise_step(self, e):
+        products_formated = {name: round(value, 2) for name, value in zip(e.model.graph.goods, e.products)}
+        print(f"Id :\033[91m{e.name}\033[0m | Money : {e.money:.2f}$ | Products : {products_formated} | Price : {e.product_price:.2f} | Production {e.step_production:.2f} | Demand : {e.step_demanded:.2f}")
+
+    def adjust_price(self, e):
+        print(f"Last labor : {e.last_labor:.2f} | Step Labor : {e.step_labor:.2f}")
+
+    def society_step(self, model):
+        print(f"Moyenne Argent Individus : {model.mean_wealth():.2f}$")
+        print(f"Satiété moyenne : {model.mean_hunger():.2f}")
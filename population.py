@@ -0,0 +1,254 @@
+import numpy as np
+
+from main import Entreprise, SellerBook, Society
+from metrics import WealthSketch
+
+
+# Moteur "colonnes" : la population n'est plus une liste d'objets Individual mais
+# un ensemble de tableaux NumPy (un par attribut). Chaque phase du tour d'un
+# individu (faim, recherche d'emploi, travail, achat, repas) s'applique à toute
+# la population d'un coup. Les entreprises restent des objets, elles sont peu nombreuses.
+
+
+class VectorEntreprise(Entreprise):
+    __slots__ = ("index",)
+
+    # Les employés ne sont plus des objets : on délègue au modèle qui possède les tableaux
+    def __init__(self, model, name, purpose, labor, price):
+        super().__init__(model, name, purpose, labor, price)
+        self.index = len(model.entreprises) - 1 # Position dans employer_id
+        model._payroll = None # Les bornes par entreprise sont à recalculer
+
+    def income_distribution(self):
+        self.model.pay_employees(self)
+
+    def lay_off(self, count):
+        self.model.lay_off(self, count)
+        return [] # Les chômeurs se retrouvent dans employer_id
+
+    def headcount(self):
+        return len(self.model.employees_of(self))
+
+    def average_salary(self):
+        employees = self.model.employees_of(self)
+        if len(employees) > 0:
+            return float(self.model.current_skill[employees].mean())
+        return 1.0 # Valeur par défaut
+
+
+class VectorSociety(Society):
+    entreprise_class = VectorEntreprise
+
+    def create_population(self, n, wealth):
+        self.wealth = np.full(n, float(wealth))
+        self.hunger = np.full(n, 100.0)
+        self.current_skill = np.zeros(n)
+        self.employer_id = np.full(n, -1, dtype=np.int64) # -1 : sans emploi
+        self.bread_inventory = np.zeros(n)
+
+        # Ordre d'embauche : les salaires sont versés dans cet ordre, comme la liste employees
+        self.hire_seq = np.full(n, -1, dtype=np.int64)
+        self.next_hire = 0
+        self._payroll = None
+
+    def population_step(self):
+        entreprises = self.get_entreprises()
+
+        self.hunger -= 2
+        self.demand_work(entreprises)
+        self.work(entreprises)
+        self.buy_bread(self.markets[self.food])
+        self.eat()
+
+    def demand_work(self, entreprises):
+        unemployed = np.flatnonzero(self.employer_id < 0)
+        if not entreprises: return
+        if self.labour_market is not None:
+            self.match_vacancies(entreprises, unemployed)
+            return
+        if len(unemployed) == 0: return
+
+        # Ordre de passage aléatoire, puis une entreprise tirée au hasard pour chacun
+        unemployed = self.rng.permutation(unemployed)
+        self.hire(entreprises, unemployed, self.rng.integers(0, len(entreprises), size=len(unemployed)))
+
+    def match_vacancies(self, entreprises, unemployed):
+        # Chaque poste ouvert est pourvu au plus une fois, dans un ordre aléatoire
+        # (les entreprises créées depuis la dernière publication n'ont pas encore de postes).
+        # Seuls les postes pourvus sont tirés : pas de tableau de tous les postes ouverts.
+        vacancies = np.array(self.labour_market.vacancies, dtype=np.int64)
+        total = int(vacancies.sum())
+        unemployed = self.rng.permutation(unemployed)[:total]
+
+        # Postes restants : une partie des employés change d'entreprise (option, comme LabourMarket.match)
+        movers = np.zeros(0, dtype=np.int64)
+        rate = self.labour_market.job_search_rate
+        if rate > 0 and total > len(unemployed):
+            employed = np.flatnonzero(self.employer_id >= 0)
+            movers = self.rng.choice(employed, size=min(total - len(unemployed), round(rate * len(employed))), replace=False)
+
+        # Postes numérotés de 0 à total - 1, entreprise par entreprise
+        posts = self.rng.choice(total, size=len(unemployed) + len(movers), replace=False)
+        taken = np.searchsorted(np.cumsum(vacancies), posts, side="right")
+        chosen, targets = taken[:len(unemployed)], taken[len(unemployed):]
+        self.hire(entreprises, unemployed, chosen)
+
+        moving = targets != self.employer_id[movers] # Poste dans sa propre entreprise : il reste ouvert
+        self.hire(entreprises, movers[moving], targets[moving])
+
+        filled = np.concatenate([chosen, targets[moving]])
+        self.labour_market.vacancies = (vacancies - np.bincount(filled, minlength=len(vacancies))).tolist()
+
+    def hire(self, entreprises, individuals, chosen):
+        if len(individuals) == 0: return
+        firm_skills = np.array([self.skills.get(e.purpose) for e in entreprises])
+
+        self.employer_id[individuals] = chosen
+        self.current_skill[individuals] = firm_skills[chosen]
+        self.hire_seq[individuals] = self.next_hire + np.arange(len(individuals))
+        self.next_hire += len(individuals)
+        self._payroll = None
+
+    def work(self, entreprises):
+        working = (self.employer_id >= 0) & (self.hunger > 0)
+        self.current_skill[working] += 0.01
+
+        # Travail total apporté à chaque entreprise
+        labour = np.bincount(self.employer_id[working], weights=self.current_skill[working], minlength=len(entreprises))
+        for entreprise, work_done in zip(entreprises, labour):
+            entreprise.add_labour(float(work_done))
+
+    def buy_bread(self, carnet: SellerBook):
+        if not carnet.sellers: return
+
+        # Besoin (stock idéal de 2 pains) et budget, comme Individual.buy
+        needed = np.floor(np.maximum(0, 2.0 - self.bread_inventory))
+        budget = self.wealth * np.where(self.hunger > 50, 0.3, 0.9)
+
+        if self.market_mode == "auction":
+            # Tout le monde poste sa demande, le carnet alloue en une passe
+            bought, spent = carnet.allocate(needed, budget)
+            self.wealth -= spent
+            self.bread_inventory += bought
+            return
+
+        # Les acheteurs passent dans un ordre aléatoire
+        buyers = self.rng.permutation(np.flatnonzero(needed > 0))
+        needed = needed[buyers]
+        budget = budget[buyers]
+
+        # On parcourt les vendeurs du moins cher au plus cher. Pour chaque vendeur, les
+        # acheteurs sont servis dans leur ordre de passage : la somme cumulée des quantités
+        # voulues donne ce qui reste au vendeur quand chacun arrive.
+        for vendeur in carnet.sellers:
+            still_buying = (needed > 0.01) & (budget > 0.01)
+            buyers, needed, budget = buyers[still_buying], needed[still_buying], budget[still_buying]
+            if len(buyers) == 0: break
+
+            price = vendeur.product_price
+            wanted = np.minimum(needed, np.floor(budget / price))
+
+            # Demande solvable, notée même si le vendeur est en rupture
+            vendeur.step_demanded += float(wanted.sum())
+
+            stock = int(vendeur.products[carnet.good])
+            if stock <= 0: continue
+
+            served_before = np.cumsum(wanted) - wanted
+            qty = np.clip(stock - served_before, 0, wanted)
+            cost = qty * price
+
+            self.wealth[buyers] -= cost
+            self.bread_inventory[buyers] += qty
+            needed -= qty
+            budget -= cost
+
+            total = float(qty.sum())
+            vendeur.money += total * price
+            vendeur.products[carnet.good] -= total
+            vendeur.step_sold += total
+
+    def eat(self):
+        to_eat = (100 - self.hunger) / 25
+
+        can_be_eaten = np.minimum(to_eat, self.bread_inventory)
+        self.bread_inventory -= can_be_eaten
+        self.hunger += can_be_eaten * 25
+
+    def employees_of(self, entreprise):
+        # Employés triés par entreprise puis par ordre d'embauche, recalculé après des embauches
+        if self._payroll is None:
+            employed = np.flatnonzero(self.employer_id >= 0)
+            order = np.lexsort((self.hire_seq[employed], self.employer_id[employed]))
+            self._payroll = employed[order]
+            n_entreprises = len(self.entreprises)
+            bounds = np.searchsorted(self.employer_id[self._payroll], np.arange(n_entreprises + 1))
+            # Début et fin du segment de chaque entreprise (la fin recule aux licenciements)
+            self._payroll_starts, self._payroll_ends = bounds[:-1], bounds[1:].copy()
+
+        i = entreprise.index
+        return self._payroll[self._payroll_starts[i]:self._payroll_ends[i]]
+
+    def lay_off(self, entreprise, count):
+        # Les derniers embauchés partent en premier : on raccourcit la fin du segment de
+        # l'entreprise, sans retrier toute la population
+        employees = self.employees_of(entreprise)
+        count = min(count, len(employees))
+        if count <= 0: return
+        self.employer_id[employees[len(employees) - count:]] = -1
+        self._payroll_ends[entreprise.index] -= count
+
+    def pay_employees(self, entreprise):
+        # Même règle que Entreprise.income_distribution : on paie dans l'ordre d'embauche
+        # tant qu'il reste plus de 0.1$ en caisse
+        employees = self.employees_of(entreprise)
+        if len(employees) == 0: return
+
+        salaries = self.current_skill[employees]
+        money_left = entreprise.money - (np.cumsum(salaries) - salaries)
+        to_pay = np.where(money_left > 0.1, np.minimum(money_left, salaries), 0.0)
+
+        self.wealth[employees] += to_pay
+        paid = float(to_pay.sum())
+        entreprise.money -= paid
+        entreprise.step_costs += paid
+
+    def population_size(self):
+        return len(self.wealth)
+
+    def mean_wealth(self):
+        return float(self.wealth.mean())
+
+    def mean_hunger(self):
+        return float(self.hunger.mean())
+
+    def employment_rate(self):
+        return float((self.employer_id >= 0).mean())
+
+    def wealth_sketch(self):
+        # Même approximation que le moteur objet, construite en bloc depuis les tableaux ;
+        # Metrics.record ne la construit qu'une fois par tour enregistré
+        return WealthSketch.from_values(self.wealth)
+
+    def population_header(self):
+        return {"next_hire": self.next_hire}
+
+    # Colonnes de la population, sauvegardées telles quelles
+    POPULATION_COLUMNS = ("wealth", "hunger", "current_skill", "employer_id", "bread_inventory", "hire_seq")
+
+    def population_state(self):
+        return {f"individual.{name}": getattr(self, name) for name in self.POPULATION_COLUMNS}
+
+    def restore_population(self, header, arrays):
+        if len(arrays["individual.wealth"]) != self.population_size():
+            raise ValueError(f"Sauvegarde de {len(arrays['individual.wealth'])} individus pour {self.population_size()} recréés")
+        for name in self.POPULATION_COLUMNS:
+            setattr(self, name, arrays[f"individual.{name}"])
+        self.next_hire = header["next_hire"]
+        self._payroll = None
+
+    def individual_stats(self):
+        entreprises = self.get_entreprises()
+        for i in range(self.population_size()):
+            working_at = entreprises[self.employer_id[i]].name if self.employer_id[i] >= 0 else None
+            print(f"Id :{i + 1} | Money : {self.wealth[i]:.2f}$ | Hunger : {int(self.hunger[i])} | Working at {working_at}")
@@ -0,0 +1,132 @@
+from array import array
+
+import numpy as np
+
+
+# Graphe de production : chaque secteur fabrique un bien à partir de travail et
+# d'intrants, avec des coefficients techniques fixes (quantité d'intrant par unité
+# produite, fonction de Leontief). Les secteurs sont ordonnés par niveaux : un secteur
+# passe après ceux qui produisent ses intrants.
+
+
+class Sector:
+    def __init__(self, name, output, inputs=None, skill=1.0):
+        self.name = name
+        self.output = output # Bien produit
+        self.inputs = dict(inputs or {}) # Bien -> quantité nécessaire par unité produite
+        self.skill = skill # Compétence de départ d'un individu embauché dans ce secteur
+
+
+class ProductionGraph:
+    def __init__(self, goods, sectors, food):
+        self.goods = tuple(goods)
+        self.good_index = {good: i for i, good in enumerate(self.goods)}
+        self.sectors = {sector.name: sector for sector in sectors}
+        self.sector_index = {name: i for i, name in enumerate(self.sectors)}
+
+        for sector in self.sectors.values():
+            for good in (sector.output, *sector.inputs):
+                if good not in self.good_index:
+                    raise ValueError(f"Bien inconnu dans le secteur {sector.name} : {good}")
+
+        # Bien acheté et mangé par les individus
+        self.food = self.good_index[food]
+
+        # Matrice des coefficients techniques : une ligne par secteur, une colonne par bien
+        self.outputs = np.array([self.good_index[s.output] for s in self.sectors.values()], dtype=np.int64)
+        self.coefficients = np.zeros((len(self.sectors), len(self.goods)))
+        for i, sector in enumerate(self.sectors.values()):
+            for good, coefficient in sector.inputs.items():
+                self.coefficients[i, self.good_index[good]] = coefficient
+
+        self.levels = self._schedule()
+
+    def _schedule(self):
+        # Tri topologique par niveaux
+        producers = {}
+        for sector in self.sectors.values():
+            producers.setdefault(sector.output, []).append(sector.name)
+
+        remaining = list(self.sectors)
+        levels = []
+        while remaining:
+            ready = [
+                name for name in remaining
+                if not any(p in remaining for good in self.sectors[name].inputs for p in producers.get(good, []))
+            ]
+            if not ready:
+                raise ValueError(f"Le graphe de production a un cycle entre : {remaining}")
+            levels.append(ready)
+            remaining = [name for name in remaining if name not in ready]
+        return levels
+
+    def output_of(self, sector):
+        return int(self.outputs[self.sector_index[sector]])
+
+    def producers_of(self, good):
+        return [name for name, sector in self.sectors.items() if self.good_index[sector.output] == good]
+
+    def level_inputs(self, level):
+        # Biens achetés par les secteurs d'un niveau
+        rows = self.coefficients[[self.sector_index[name] for name in level]]
+        return [int(good) for good in np.flatnonzero(rows.sum(axis=0) > 0)]
+
+    def input_cost(self, sector, prices):
+        # Coût des intrants pour une unité produite
+        return float(self.coefficients[self.sector_index[sector]] @ np.asarray(prices))
+
+    def _firm_arrays(self, firms):
+        sectors = np.array([self.sector_index[e.purpose] for e in firms], dtype=np.int64)
+        stocks = np.array([e.products for e in firms], dtype=float).reshape(len(firms), len(self.goods))
+        labour_capacity = np.array([e.step_labor / e.labor for e in firms])
+        return sectors, stocks, labour_capacity
+
+    def input_needs(self, firms):
+        # Besoin de chaque entreprise pour chaque bien : de quoi produire jusqu'à deux fois
+        # sa capacité de travail, sans dépasser la demande (celle du tour et celle reçue
+        # trop tard au tour précédent), moins son stock
+        sectors, stocks, labour_capacity = self._firm_arrays(firms)
+        demanded = np.array([e.step_demanded + e.late_demand for e in firms])
+        coefficients = self.coefficients[sectors]
+
+        target = np.minimum(labour_capacity * 2, demanded)
+        return np.where(coefficients > 0, coefficients * target[:, None] - stocks, 0.0)
+
+    def produce(self, firms):
+        # Production de toutes les entreprises en une passe : min(travail, intrants / coefficients)
+        if not firms: return
+        sectors, stocks, labour_capacity = self._firm_arrays(firms)
+        coefficients = self.coefficients[sectors]
+
+        with np.errstate(divide="ignore"):
+            by_inputs = np.where(coefficients > 0, stocks / np.where(coefficients > 0, coefficients, 1), np.inf).min(axis=1)
+        production = np.minimum(labour_capacity, by_inputs)
+
+        stocks -= production[:, None] * coefficients
+        stocks[np.arange(len(firms)), self.outputs[sectors]] += production
+
+        for e, stock, produced in zip(firms, stocks, production):
+            e.products = array('d', stock)
+            e.step_production = float(produced)
+
+    def to_dict(self):
+        return {
+            "goods": list(self.goods),
+            "food": self.goods[self.food],
+            "sectors": [[s.name, s.output, s.inputs, s.skill] for s in self.sectors.values()],
+        }
+
+    @classmethod
+    def from_dict(cls, spec):
+        return cls(spec["goods"], [Sector(*sector) for sector in spec["sectors"]], spec["food"])
+
+
+# Configuration d'origine : le blé est fait de travail, le pain de travail et de 3 blés
+DEFAULT_GRAPH = ProductionGraph(
+    goods=("wheet", "bread"),
+    sectors=[
+        Sector("food_raw_material", "wheet", skill=1.0),
+        Sector("agrifood", "bread", {"wheet": 3}, skill=2.0),
+    ],
+    food="bread",
+)
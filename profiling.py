@@ -0,0 +1,145 @@
+import time
+import tracemalloc
+
+from main import Individual
+
+
+# Profilage d'un modèle en cours de route : temps, nombre d'appels et (en option) mémoire
+# allouée par phase du tour et par méthode d'agent. Les méthodes ne sont enveloppées que
+# pendant que le profileur est actif : désactivé, il ne coûte rien.
+#
+#   profiler = Profiler(society, allocations=True)
+#   with profiler:
+#       for _ in range(100): society.step()
+#   print(profiler.format_report())
+
+# Phases du tour (méthodes du modèle) ; celles absentes d'un moteur sont ignorées
+PHASES = (
+    "match_workers", "population_step", "entreprises_step", "record_metrics", "post_vacancies", "adjust_prices",
+    # Moteur vectoriel : étapes de population_step et paie
+    "demand_work", "work", "buy_bread", "eat", "pay_employees",
+)
+
+INDIVIDUAL_METHODS = ("demand_work", "work", "buy", "post_order", "eat")
+
+ENTREPRISE_METHODS = (
+    "start_step", "income_distribution", "intermediary_consumption", "buy_input", "post_order",
+    "close_step", "adjust_price",
+)
+
+CALLS, SECONDS, ALLOCATED = 0, 1, 2
+
+
+class Profiler:
+    def __init__(self, model, allocations=False):
+        self.model = model
+        self.allocations = allocations # Mémoire nette allouée par tracemalloc (ralentit nettement)
+        self.enabled = False
+        # Nom -> [appels, secondes, octets], temps inclusifs (une phase compte ses méthodes d'agent)
+        self.stats: dict[str, list] = {}
+        # (propriétaire, attribut, enveloppe posée par ce profileur)
+        self._patched = []
+        self._started_tracing = False
+
+    def enable(self):
+        if self.enabled: return
+        self.enabled = True
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        # Phases : enveloppées sur l'instance, les autres modèles ne sont pas touchés
+        for name in PHASES:
+            if hasattr(self.model, name):
+                self._patch(self.model, name, self._timed(name))
+
+        # Méthodes d'agents : enveloppées sur la classe (les agents ont des __slots__),
+        # mais seuls les agents de ce modèle sont comptés
+        classes = ((Individual, INDIVIDUAL_METHODS), (self.model.entreprise_class, ENTREPRISE_METHODS))
+        for cls, names in classes:
+            for name in names:
+                label = f"{cls.__name__}.{name}"
+                self._patch(cls, name, self._timed_agent(label))
+
+    def disable(self):
+        if not self.enabled: return
+        self.enabled = False
+        for owner, name, wrapper in reversed(self._patched):
+            outer = vars(owner).get(name)
+            if outer is wrapper:
+                # Enveloppe la plus externe : on remet ce qu'il y avait avant elle
+                if wrapper.restore is None: delattr(owner, name)
+                else: setattr(owner, name, wrapper.restore)
+                continue
+            # Un autre profileur actif l'a enveloppée à son tour (désactivation hors ordre) :
+            # on la retire de la chaîne, l'enveloppe du dessus appelle directement la suivante
+            while outer.chain[0] is not wrapper: outer = outer.chain[0]
+            outer.chain[0] = wrapper.chain[0]
+            outer.restore = wrapper.restore
+        self._patched = []
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def reset(self):
+        for values in self.stats.values():
+            values[:] = [0, 0.0, 0]
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def _patch(self, owner, name, wrap):
+        # chain[0] : fonction enveloppée (éventuellement l'enveloppe d'un autre profileur),
+        # modifiable pour retirer une enveloppe du milieu de la chaîne
+        chain = [getattr(owner, name)]
+        wrapper = wrap(chain)
+        wrapper.chain = chain
+        wrapper.restore = vars(owner).get(name) # None : méthode héritée, à supprimer au retrait
+        self._patched.append((owner, name, wrapper))
+        setattr(owner, name, wrapper)
+
+    def _timed(self, label):
+        values = self.stats.setdefault(label, [0, 0.0, 0])
+        allocations = self.allocations
+
+        def wrap(chain):
+            def timed(*args, **kwargs):
+                before = tracemalloc.get_traced_memory()[0] if allocations else 0
+                start = time.perf_counter()
+                try:
+                    return chain[0](*args, **kwargs)
+                finally:
+                    values[SECONDS] += time.perf_counter() - start
+                    values[CALLS] += 1
+                    if allocations: values[ALLOCATED] += tracemalloc.get_traced_memory()[0] - before
+            return timed
+        return wrap
+
+    def _timed_agent(self, label):
+        model = self.model
+        wrap_timed = self._timed(label)
+
+        def wrap(chain):
+            timed = wrap_timed(chain)
+
+            def timed_agent(agent, *args, **kwargs):
+                if agent.model is not model: return chain[0](agent, *args, **kwargs)
+                return timed(agent, *args, **kwargs)
+            return timed_agent
+        return wrap
+
+    def report(self):
+        # Lignes triées par temps décroissant : (nom, appels, secondes, octets)
+        rows = [(name, *values) for name, values in self.stats.items() if values[CALLS]]
+        return sorted(rows, key=lambda row: row[1 + SECONDS], reverse=True)
+
+    def format_report(self):
+        lines = [f"{'Phase / méthode':<44} | {'Appels':>9} | {'Total (ms)':>11} | {'Par appel (µs)':>14} | {'Alloué (Ko)':>11}"]
+        for name, calls, seconds, allocated in self.report():
+            allocated = f"{allocated / 1024:11.1f}" if self.allocations else f"{'-':>11}"
+            lines.append(f"{name:<44} | {calls:9d} | {seconds * 1e3:11.2f} | {seconds / calls * 1e6:14.2f} | {allocated}")
+        return "\n".join(lines)
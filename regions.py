@@ -0,0 +1,206 @@
+import json
+import multiprocessing
+from array import array
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from batch import DEFAULT_SCENARIO, build_society, summarize
+
+
+# Économie découpée en régions : chaque région est une Society (sa population, ses
+# entreprises, ses prix) qui tourne dans son propre processus. À la fin de chaque tour,
+# les régions s'échangent leurs offres par mémoire partagée, sans sérialiser d'agents :
+#   offers[r, g] : prix et stock mis à l'export par la région r pour le bien g
+#   trades[i, r, g] : quantité achetée et montant payé par la région i à la région r
+# Les prix restent formés localement (adjust_price) ; les ventes à l'export sont
+# réglées à l'échange suivant.
+
+PRICE, QUANTITY = 0, 1
+BOUGHT, PAID = 0, 1
+
+
+class RemoteSeller:
+    # Offre d'une autre région, vue comme un vendeur des carnets locaux
+    def __init__(self, region, good, n_goods, price, quantity):
+        self.region = region
+        self.product_price = price
+        self.products = array('d', [0.0] * n_goods)
+        self.products[good] = quantity
+        self.offered = quantity
+        self.money = 0.0
+        self.step_demanded = 0.0
+        self.step_sold = 0.0
+
+
+class Region:
+    def __init__(self, index, society, offers, trades, export_share):
+        self.index = index
+        self.society = society
+        self.offers = offers
+        self.trades = trades
+        self.n_regions = len(offers)
+        self.export_share = export_share # Part du stock de l'entreprise la moins chère mise à l'export
+        # Stock réservé à l'export par bien : (entreprise, quantité)
+        self.exports = {}
+        self.imported = 0.0
+        self.exported = 0.0
+
+    def import_offers(self):
+        # Chaque région reçoit une part égale des offres étrangères : un même stock n'est jamais vendu deux fois
+        self.society.remote_sellers = {}
+        if self.n_regions == 1: return
+        share = 1 / (self.n_regions - 1)
+        n_goods = self.offers.shape[1]
+
+        for region in range(self.n_regions):
+            if region == self.index: continue
+            for good in np.flatnonzero(self.offers[region, :, QUANTITY] > 0):
+                price, quantity = self.offers[region, good]
+                seller = RemoteSeller(region, int(good), n_goods, float(price), float(quantity) * share)
+                self.society.remote_sellers.setdefault(int(good), []).append(seller)
+
+    def report_purchases(self):
+        self.trades[self.index] = 0
+        for good, sellers in self.society.remote_sellers.items():
+            for seller in sellers:
+                self.trades[self.index, seller.region, good] = (seller.offered - seller.products[good], seller.money)
+                self.imported += seller.money
+
+    def settle_exports(self):
+        # Ventes à l'export du tour : argent encaissé, invendus rendus au stock de l'entreprise
+        for good, (entreprise, reserved) in self.exports.items():
+            paid = float(self.trades[:, self.index, good, PAID].sum())
+            entreprise.money += paid
+            entreprise.products[good] += reserved - float(self.trades[:, self.index, good, BOUGHT].sum())
+            self.exported += paid
+        self.exports = {}
+
+    def publish_offers(self):
+        # Chaque bien est offert par l'entreprise locale la moins chère qui en a en stock
+        self.offers[self.index] = 0
+        if self.n_regions == 1: return
+
+        for good in range(self.offers.shape[1]):
+            stocked = [e for e in self.society.producers_of(good) if e.products[good] > 0]
+            if not stocked: continue
+            entreprise = min(stocked, key=lambda e: e.product_price)
+
+            reserved = entreprise.products[good] * self.export_share
+            entreprise.products[good] -= reserved
+            self.exports[good] = (entreprise, reserved)
+            self.offers[self.index, good] = (entreprise.product_price, reserved)
+
+    def step(self, barrier):
+        self.import_offers()
+        self.society.step()
+        self.report_purchases()
+        # Tous les achats sont écrits avant que les exportateurs ne les lisent...
+        barrier.wait()
+        self.settle_exports()
+        self.publish_offers()
+        # ... et toutes les offres avant que le tour suivant ne commence
+        barrier.wait()
+
+    def summary(self, scenario):
+        return {
+            **summarize({**scenario, "steps": self.society.steps}, self.society),
+            "region": self.index,
+            "imports": self.imported,
+            "exports": self.exported,
+        }
+
+
+def run_region(index, scenario, offers_memory, trades_memory, shapes, barrier, connection, export_share):
+    offers = np.ndarray(shapes[0], dtype=float, buffer=offers_memory.buf)
+    trades = np.ndarray(shapes[1], dtype=float, buffer=trades_memory.buf)
+    region = None
+
+    try:
+        # Construction comprise : une région qui échoue ici libère aussi les autres
+        region = Region(index, build_society(scenario), offers, trades, export_share)
+        while True:
+            command, steps = connection.recv()
+            if command == "stop": break
+            for _ in range(steps): region.step(barrier)
+            connection.send(region.summary(scenario))
+    except BaseException:
+        # Les autres régions ne doivent pas rester bloquées à la barrière
+        barrier.abort()
+        raise
+    finally:
+        del offers, trades, region
+        offers_memory.close()
+        trades_memory.close()
+
+
+def _shared_array(shape):
+    memory = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+    values = np.ndarray(shape, dtype=float, buffer=memory.buf)
+    values[:] = 0
+    return memory, values
+
+
+class RegionalEconomy:
+    # Coordinateur : possède la mémoire partagée des échanges et pilote un processus par région.
+    # Les régions sont des scénarios au format de batch.py (n, entreprises, richesse, graine...).
+    def __init__(self, regions, export_share=0.5):
+        self.scenarios = [{**DEFAULT_SCENARIO, **region} for region in regions]
+        # Les échanges sont indexés par bien : toutes les régions doivent avoir les mêmes biens
+        goods = self.scenarios[0]["graph"].goods
+        for scenario in self.scenarios:
+            if scenario["graph"].goods != goods:
+                raise ValueError(f"Biens différents entre régions : {scenario['graph'].goods} contre {goods}")
+        n_regions, n_goods = len(self.scenarios), len(goods)
+        shapes = ((n_regions, n_goods, 2), (n_regions, n_regions, n_goods, 2))
+        self._offers_memory, self.offers = _shared_array(shapes[0])
+        self._trades_memory, self.trades = _shared_array(shapes[1])
+
+        # Gardée ici : avec spawn, les processus la reconstruisent après leur démarrage
+        self.barrier = multiprocessing.Barrier(n_regions)
+        self.connections = []
+        self.workers = []
+        for index, scenario in enumerate(self.scenarios):
+            parent, child = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=run_region,
+                args=(index, scenario, self._offers_memory, self._trades_memory, shapes, self.barrier, child, export_share),
+                daemon=True,
+            )
+            worker.start()
+            # Seul le processus garde ce bout : s'il meurt, recv() lève EOFError au lieu d'attendre
+            child.close()
+            self.connections.append(parent)
+            self.workers.append(worker)
+
+    def run(self, steps):
+        # Renvoie le résumé de chaque région, dans l'ordre des régions
+        for connection in self.connections: connection.send(("run", steps))
+        return [connection.recv() for connection in self.connections]
+
+    def summary(self):
+        return self.run(0)
+
+    def close(self):
+        for connection, worker in zip(self.connections, self.workers):
+            # Une région morte entre-temps (erreur ailleurs) n'a plus de commande à recevoir
+            try: connection.send(("stop", 0))
+            except BrokenPipeError: pass
+        for worker in self.workers: worker.join()
+        del self.offers, self.trades
+        for memory in (self._offers_memory, self._trades_memory):
+            memory.close()
+            memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    regions = [{"seed": seed, "wealth": wealth} for seed, wealth in enumerate((50, 100, 150, 200))]
+    with RegionalEconomy(regions) as economy:
+        for summary in economy.run(200):
+            print(json.dumps(summary))
@@ -0,0 +1,73 @@
+import json
+import os
+
+import numpy as np
+
+
+# Format de sauvegarde : un en-tête JSON (paramètres, états des générateurs, description
+# des tableaux) suivi des tableaux bruts, chacun aligné sur 64 octets. Les tableaux
+# peuvent donc être projetés en mémoire (np.memmap) sans rien lire ni copier.
+#
+#   MAGIC | longueur de l'en-tête (uint64) | en-tête JSON | tableau 1 | tableau 2 | ...
+
+MAGIC = b"ECOSNAP1"
+ALIGNMENT = 64
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_snapshot(path, header, arrays):
+    arrays = {name: np.ascontiguousarray(values) for name, values in arrays.items()}
+
+    # Les positions des tableaux dépendent de la taille de l'en-tête, qui les contient :
+    # on les calcule relativement au début de la zone de données
+    specs = {}
+    offset = 0
+    for name, values in arrays.items():
+        offset = _aligned(offset)
+        specs[name] = {"dtype": values.dtype.str, "shape": list(values.shape), "offset": offset}
+        offset += values.nbytes
+
+    encoded = json.dumps({**header, "arrays": specs}).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(encoded))
+
+    # Écriture dans un fichier temporaire puis remplacement : un fichier existant n'est jamais
+    # réécrit sur place. Les modèles chargés avec mmap=True depuis l'ancien fichier (y compris
+    # celui qu'on sauvegarde, ou un fork précédent au même chemin) gardent leurs pages intactes.
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(encoded)).tobytes())
+            f.write(encoded)
+            for name, values in arrays.items():
+                f.seek(data_start + specs[name]["offset"])
+                f.write(values.tobytes())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path): os.unlink(temp_path)
+        raise
+
+
+def read_snapshot(path, mmap=False):
+    # mmap=True : tableaux projetés en copie sur écriture, seules les pages modifiées sont copiées
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} n'est pas une sauvegarde de simulation")
+        header_length = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        header = json.loads(f.read(header_length))
+        data_start = _aligned(len(MAGIC) + 8 + header_length)
+
+        arrays = {}
+        for name, spec in header.pop("arrays").items():
+            dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+            offset = data_start + spec["offset"]
+            if mmap and np.prod(shape) > 0:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="c", offset=offset, shape=shape)
+            else:
+                f.seek(offset)
+                arrays[name] = np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+    return header, arrays